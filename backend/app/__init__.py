@@ -37,6 +37,53 @@ def create_app(config_name=None):
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@company.com')
     
+    # Directory whose <name>.html files replace the built-in notification templates
+    app.config['EMAIL_TEMPLATES_DIR'] = os.environ.get('EMAIL_TEMPLATES_DIR')
+    
+    # Outbox delivery: attempts before giving up, first retry delay in seconds
+    # (doubling per attempt) and how long a worker holds a claimed batch
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    app.config['MAIL_OUTBOX_RETRY_DELAY'] = int(os.environ.get('MAIL_OUTBOX_RETRY_DELAY', 30))
+    app.config['MAIL_OUTBOX_LEASE'] = int(os.environ.get('MAIL_OUTBOX_LEASE', 300))
+    
+    # Seconds to collect a recipient's notifications into one digest email (0 sends each on its own)
+    app.config['MAIL_DIGEST_WINDOW'] = int(os.environ.get('MAIL_DIGEST_WINDOW', 0))
+    
+    # Delivery outcomes are written to email_logs once this many are waiting, or
+    # after this many seconds under sustained load
+    app.config['MAIL_LOG_BATCH_SIZE'] = int(os.environ.get('MAIL_LOG_BATCH_SIZE', 500))
+    app.config['MAIL_LOG_FLUSH_INTERVAL'] = float(os.environ.get('MAIL_LOG_FLUSH_INTERVAL', 5))
+    
+    # Calendar provider the sync worker writes to: "mock" logs each change,
+    # "fake" keeps events in memory with a simulated round trip
+    app.config['CALENDAR_PROVIDER'] = os.environ.get('CALENDAR_PROVIDER', 'mock')
+    
+    # Schedule changes sent per provider call (Google Calendar batches hold up to 50)
+    app.config['CALENDAR_BATCH_SIZE'] = int(os.environ.get('CALENDAR_BATCH_SIZE', 50))
+    
+    # Calendar sync: attempts before giving up, first retry delay in seconds
+    # (doubling per attempt) and how long a worker holds a claimed batch
+    app.config['CALENDAR_SYNC_MAX_ATTEMPTS'] = int(os.environ.get('CALENDAR_SYNC_MAX_ATTEMPTS', 5))
+    app.config['CALENDAR_SYNC_RETRY_DELAY'] = int(os.environ.get('CALENDAR_SYNC_RETRY_DELAY', 30))
+    app.config['CALENDAR_SYNC_LEASE'] = int(os.environ.get('CALENDAR_SYNC_LEASE', 300))
+    
+    # Fake provider round-trip seconds and per-change failure probability
+    app.config['CALENDAR_FAKE_LATENCY'] = float(os.environ.get('CALENDAR_FAKE_LATENCY', 0.2))
+    app.config['CALENDAR_FAKE_FAILURE_RATE'] = float(os.environ.get('CALENDAR_FAKE_FAILURE_RATE', 0))
+    
+    # Reject handover schedules that overlap another booking of their organizer or attendees
+    app.config['HANDOVER_ENFORCE_CONFLICTS'] = os.environ.get('HANDOVER_ENFORCE_CONFLICTS', 'false').lower() == 'true'
+    
+    # Working hours and days the free-slot finder offers for handovers, e.g. "08:30-17:30" and "mon,tue,wed,thu"
+    app.config['HANDOVER_WORKING_HOURS'] = os.environ.get('HANDOVER_WORKING_HOURS', '09:00-17:00')
+    app.config['HANDOVER_WORKING_DAYS'] = os.environ.get('HANDOVER_WORKING_DAYS', 'mon,tue,wed,thu,fri')
+    
+    # IANA time zone handover dates and times are entered in, e.g. "Asia/Kolkata"
+    app.config['HANDOVER_TIMEZONE'] = os.environ.get('HANDOVER_TIMEZONE', 'UTC')
+    
+    # Days of past handovers and last working days kept in ICS calendar feeds
+    app.config['CALENDAR_FEED_PAST_DAYS'] = int(os.environ.get('CALENDAR_FEED_PAST_DAYS', 30))
+    
     # Google OAuth configuration
     app.config['GOOGLE_CLIENT_ID'] = os.environ.get('GOOGLE_CLIENT_ID')
     app.config['GOOGLE_CLIENT_SECRET'] = os.environ.get('GOOGLE_CLIENT_SECRET')
@@ -45,6 +92,32 @@ def create_app(config_name=None):
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 86400  # 24 hours
     
+    # Seconds an authenticated user's id, role and status are reused before re-reading them
+    app.config['AUTH_PRINCIPAL_CACHE_TTL'] = float(os.environ.get('AUTH_PRINCIPAL_CACHE_TTL', 30))
+    
+    # Werkzeug hashing method and cost for new passwords, e.g. "scrypt:32768:8:1"
+    # or "pbkdf2:sha256:600000"; older hashes are upgraded on login
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    
+    # Processes per worker that hash passwords off the request thread (0 hashes inline)
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    
+    # Trust signed token claims instead of reading the user on each request;
+    # revocations still apply within CATALOG_VERSION_CHECK_INTERVAL seconds
+    app.config['AUTH_STATELESS'] = os.environ.get('AUTH_STATELESS', 'false').lower() == 'true'
+    
+    # Seconds an approximate total for cursor-paginated listings is reused
+    app.config['CURSOR_TOTAL_CACHE_TTL'] = int(os.environ.get('CURSOR_TOTAL_CACHE_TTL', 60))
+    
+    # Case numbers reserved per worker at a time (1 keeps numbers gapless and ordered)
+    app.config['CASE_NUMBER_BLOCK_SIZE'] = int(os.environ.get('CASE_NUMBER_BLOCK_SIZE', 1))
+    
+    # Seconds a worker trusts its cached catalogues before re-checking their version
+    app.config['CATALOG_VERSION_CHECK_INTERVAL'] = float(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', 2))
+    
+    # Seconds a dashboard statistics snapshot is reused between case and sign-off writes
+    app.config['DASHBOARD_CACHE_TTL'] = float(os.environ.get('DASHBOARD_CACHE_TTL', 5))
+    
     # Initialize extensions with app
     db.init_app(app)
     login_manager.init_app(app)
@@ -77,6 +150,10 @@ def create_app(config_name=None):
     app.register_blueprint(main_bp)
     app.register_blueprint(payment_bp, url_prefix='/payment')
     
+    # Compile notification email templates once per process
+    from app.services.email_templates import EmailTemplateRegistry
+    EmailTemplateRegistry.init_app(app)
+    
     # Register CLI commands
     from app.cli import register_commands
     register_commands(app)
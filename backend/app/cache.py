@@ -0,0 +1,117 @@
+"""
+In-process caches shared by routes and services
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class FrozenDict(dict):
+    """A dict that refuses mutation, safe to share between serialized responses"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('FrozenDict is read-only')
+    
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+class TTLCache:
+    """Thread-safe, size-bounded cache whose entries expire after ``ttl`` seconds.
+    
+    Least recently used entries are evicted first once ``maxsize`` is reached.
+    Each gunicorn worker holds its own instance, so cached values may lag other
+    workers by up to ``ttl`` seconds.
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is self._MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value for ``key``, computing it with ``factory()`` on a miss"""
+        value = self.get(key, self._MISSING)
+        if value is self._MISSING:
+            value = factory()
+            self.set(key, value, ttl=ttl)
+        return value
+    
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class VersionedCatalog:
+    """In-process copy of a catalogue, reloaded when its version row changes.
+    
+    Writers bump the version in the same transaction as the catalogue change
+    (see ``CatalogVersion``); every worker compares its cached version with the
+    database at most once per ``CATALOG_VERSION_CHECK_INTERVAL`` seconds.
+    """
+    
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._value = None
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        from flask import current_app
+        from app.models import CatalogVersion
+        
+        interval = current_app.config.get('CATALOG_VERSION_CHECK_INTERVAL', 2)
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < interval:
+                return self._value
+            version = CatalogVersion.current(self.name)
+            if version != self._version or self._value is None:
+                self._value = self.loader()
+                self._version = version
+            self._checked_at = now
+            return self._value
+    
+    def bump(self):
+        """Record a catalogue change in the current transaction and drop the local copy"""
+        from app.models import CatalogVersion
+        
+        CatalogVersion.bump(self.name)
+        self.invalidate()
+    
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = None
+    
+    def reset(self):
+        """Forget the cached copy and its version, e.g. after switching databases"""
+        with self._lock:
+            self._value = self._version = self._checked_at = None
@@ -1,10 +1,20 @@
 """
 CLI Commands for the application
 """
+import os
+import time
 import click
+from flask import current_app
 from flask.cli import with_appcontext
 from app import db
-from app.models import User, Department, ChecklistTemplate, UserRole
+from app.models import User, Department, ChecklistTemplate, SeparationCase, UserRole
+from app.services.calendar_sync_service import CalendarSyncService
+from app.services.catalog_service import CatalogService
+from app.services.email_service import EmailService
+from app.services.handover_service import HandoverService
+from app.services.hierarchy_service import HierarchyService
+from app.services.reporting_service import ReportingService
+from app.services.user_import_service import UserImportService
 
 
 def register_commands(app):
@@ -17,6 +27,15 @@ def register_commands(app):
         db.create_all()
         click.echo('Database initialized.')
     
+    @app.cli.command('create-indexes')
+    @with_appcontext
+    def create_indexes():
+        """Create any indexes declared on the models that the database is missing"""
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        click.echo('Indexes created.')
+    
     @app.cli.command('drop-db')
     @with_appcontext
     def drop_db():
@@ -48,6 +67,7 @@ def register_commands(app):
                 click.echo(f"Created department: {dept_data['name']}")
             departments[dept_data['code']] = dept
         
+        CatalogService.departments_changed()
         db.session.commit()
         
         # Create users
@@ -111,6 +131,7 @@ def register_commands(app):
         ]
         
         created_users = {}
+        new_users = []
         for user_data in users_data:
             user = User.query.filter_by(email=user_data['email']).first()
             if not user:
@@ -125,9 +146,13 @@ def register_commands(app):
                 )
                 user.set_password('password123')
                 db.session.add(user)
+                new_users.append(user)
                 click.echo(f"Created user: {user_data['email']}")
             created_users[user_data['email']] = user
         
+        db.session.flush()
+        for user in new_users:
+            HierarchyService.add_user(user)
         db.session.commit()
         
         # Set manager relationships
@@ -136,7 +161,7 @@ def register_commands(app):
                 user = created_users[user_data['email']]
                 manager = created_users.get(user_data['manager_email'])
                 if manager and user.manager_id != manager.id:
-                    user.manager_id = manager.id
+                    HierarchyService.set_manager(user, manager.id)
                     click.echo(f"Set manager for {user_data['email']}: {user_data['manager_email']}")
         
         db.session.commit()
@@ -195,9 +220,108 @@ def register_commands(app):
                 db.session.add(template)
                 click.echo(f"Created template: {template_data['name']}")
         
+        CatalogService.templates_changed()
         db.session.commit()
         click.echo('\nChecklist templates created successfully!')
     
+    @app.cli.command('import-users')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(UserImportService.FORMATS),
+                  help='Input format (default: from the file extension)')
+    @click.option('--batch-size', type=int, default=UserImportService.BATCH_SIZE, show_default=True)
+    @click.option('--hash-workers', type=int, help='Password hashing processes (default: PASSWORD_HASH_WORKERS)')
+    @with_appcontext
+    def import_users(path, fmt, batch_size, hash_workers):
+        """Import users from a CSV or JSON Lines file"""
+        fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        if hash_workers is not None:
+            current_app.config['PASSWORD_HASH_WORKERS'] = hash_workers
+        
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8-sig') as stream:
+            result = UserImportService.import_rows(UserImportService.read_rows(stream, fmt), batch_size=batch_size)
+        
+        for error in result['errors']:
+            click.echo(f"Row {error['row']} ({error['email'] or '-'}): {error['error']}", err=True)
+        click.echo(f"Imported {result['created']} users from {os.path.basename(path)} in "
+                   f"{time.perf_counter() - started:.1f}s; {result['failed']} rows rejected.")
+    
+    @app.cli.command('run-mail-worker')
+    @click.option('--batch-size', type=int, default=50, show_default=True, help='Emails sent per SMTP connection')
+    @click.option('--poll-interval', type=float, default=2.0, show_default=True,
+                  help='Seconds to wait when no email is due')
+    @click.option('--once', is_flag=True, help='Exit once no email is due instead of polling')
+    @with_appcontext
+    def run_mail_worker(batch_size, poll_interval, once):
+        """Deliver queued emails from the outbox"""
+        click.echo('Mail worker started.')
+        # Log rows left unflushed by a previous run
+        EmailService.flush_logs()
+        unlogged, flushed_at = 0, time.monotonic()
+        while True:
+            claimed = EmailService.deliver_pending(batch_size=batch_size)
+            db.session.remove()
+            unlogged += claimed
+            if unlogged and (not claimed or unlogged >= current_app.config['MAIL_LOG_BATCH_SIZE']
+                             or time.monotonic() - flushed_at >= current_app.config['MAIL_LOG_FLUSH_INTERVAL']):
+                EmailService.flush_logs()
+                unlogged, flushed_at = 0, time.monotonic()
+            if claimed:
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
+        click.echo('No emails due; mail worker stopped.')
+    
+    @app.cli.command('run-calendar-worker')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Changes applied per provider call [default: CALENDAR_BATCH_SIZE]')
+    @click.option('--poll-interval', type=float, default=2.0, show_default=True,
+                  help='Seconds to wait when no change is due')
+    @click.option('--once', is_flag=True, help='Exit once no change is due instead of polling')
+    @with_appcontext
+    def run_calendar_worker(batch_size, poll_interval, once):
+        """Apply queued handover schedule changes to the calendar provider"""
+        batch_size = batch_size or current_app.config['CALENDAR_BATCH_SIZE']
+        click.echo('Calendar worker started.')
+        while True:
+            claimed = CalendarSyncService.process_pending(batch_size=batch_size)
+            db.session.remove()
+            if claimed:
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
+        click.echo('No calendar changes due; calendar worker stopped.')
+    
+    @app.cli.command('rebuild-progress-counters')
+    @with_appcontext
+    def rebuild_progress_counters():
+        """Recompute checklist and sign-off counters on all separation cases"""
+        count = SeparationCase.rebuild_progress_counters()
+        click.echo(f'Rebuilt progress counters for {count} cases.')
+    
+    @app.cli.command('rebuild-user-hierarchy')
+    @with_appcontext
+    def rebuild_user_hierarchy():
+        """Recompute the management chain closure table from users.manager_id"""
+        count = HierarchyService.rebuild()
+        click.echo(f'Rebuilt user hierarchy with {count} rows.')
+    
+    @app.cli.command('rebuild-handover-attendees')
+    @with_appcontext
+    def rebuild_handover_attendees():
+        """Recompute the handover attendee table from the schedules' attendees JSON"""
+        count = HandoverService.rebuild()
+        click.echo(f'Rebuilt {count} handover attendee rows.')
+    
+    @app.cli.command('rebuild-report-rollups')
+    @with_appcontext
+    def rebuild_report_rollups():
+        """Recompute the daily reporting rollups from cases and sign-offs"""
+        count = ReportingService.rebuild()
+        click.echo(f'Rebuilt {count} daily department rollups.')
+    
     @app.cli.command('seed-all')
     @with_appcontext
     def seed_all():
@@ -0,0 +1,19 @@
+"""
+Dialect-specific SQL helpers
+"""
+from app import db
+
+
+def upsert_insert(model):
+    """Return an INSERT for ``model`` supporting ``on_conflict_do_nothing/update``.
+    
+    PostgreSQL and SQLite share the ON CONFLICT syntax; other backends are not supported.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Upserts are not supported on {dialect}')
+    return insert(model)
@@ -2,9 +2,10 @@
 Database Models for Employee Separation Management System
 """
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.orm import selectinload
 from app import db
+from app.passwords import hash_password, verify_password, needs_rehash
 
 
 # User Roles Enum
@@ -36,6 +37,32 @@ class SignOffStatus:
     REJECTED = 'rejected'
 
 
+# Handover attendee response Enum
+class ResponseStatus:
+    NEEDS_ACTION = 'needs_action'
+    ACCEPTED = 'accepted'
+    TENTATIVE = 'tentative'
+    DECLINED = 'declined'
+    
+    @classmethod
+    def all_statuses(cls):
+        return [cls.NEEDS_ACTION, cls.ACCEPTED, cls.TENTATIVE, cls.DECLINED]
+
+
+# SeparationCase counter column for each sign-off status
+SIGNOFF_STATUS_COUNTERS = {
+    SignOffStatus.PENDING: 'signoffs_pending',
+    SignOffStatus.APPROVED: 'signoffs_approved',
+    SignOffStatus.REJECTED: 'signoffs_rejected',
+}
+
+
+def _department_dict(department_id):
+    """Serialized department from the shared registry instead of a lazy load"""
+    from app.services.catalog_service import CatalogService
+    return CatalogService.get_department(department_id)
+
+
 class Department(db.Model):
     """Department model"""
     __tablename__ = 'departments'
@@ -80,6 +107,7 @@ class User(UserMixin, db.Model):
     profile_picture = db.Column(db.String(255))
     google_id = db.Column(db.String(100), unique=True, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    calendar_feed_token = db.Column(db.String(64), unique=True)  # secret in the user's ICS feed URL
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login = db.Column(db.DateTime)
@@ -92,11 +120,18 @@ class User(UserMixin, db.Model):
     managed_cases = db.relationship('SeparationCase', foreign_keys='SeparationCase.direct_manager_id',
                                     back_populates='direct_manager', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('ix_users_manager_active', 'manager_id', 'is_active'),
+    )
+    
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     @property
     def full_name(self):
@@ -108,6 +143,59 @@ class User(UserMixin, db.Model):
     def is_manager(self):
         return self.role in [UserRole.DIRECT_MANAGER, UserRole.DEPARTMENT_MANAGER, UserRole.SEPARATION_MANAGER]
     
+    # Guards the recursive org query against manager_id cycles
+    MAX_ORG_DEPTH = 64
+    
+    @staticmethod
+    def org_tree_cte(root_ids, max_depth=None):
+        """Recursive CTE of (id, manager_id, role, depth) for active users under ``root_ids``.
+        
+        Roots always expand to their reports; deeper levels only expand through managers.
+        """
+        users = User.__table__
+        max_depth = User.MAX_ORG_DEPTH if max_depth is None else min(max_depth, User.MAX_ORG_DEPTH)
+        
+        tree = db.select(
+            users.c.id, users.c.manager_id, users.c.role, db.literal(0).label('depth')
+        ).where(
+            users.c.id.in_(root_ids), users.c.is_active == True
+        ).cte('org_tree', recursive=True)
+        
+        reports = users.alias('reports')
+        return tree.union_all(db.select(
+            reports.c.id, reports.c.manager_id, reports.c.role, tree.c.depth + 1
+        ).where(
+            reports.c.manager_id == tree.c.id,
+            reports.c.is_active == True,
+            tree.c.depth < max_depth,
+            db.or_(
+                tree.c.depth == 0,
+                tree.c.role.in_([UserRole.DIRECT_MANAGER, UserRole.DEPARTMENT_MANAGER, UserRole.SEPARATION_MANAGER])
+            )
+        ))
+    
+    @staticmethod
+    def build_org_tree(root_ids, max_depth=None):
+        """Nested ``{'user', 'reports'}`` trees under ``root_ids`` from a single recursive query"""
+        tree = User.org_tree_cte(root_ids, max_depth)
+        rows = db.session.query(User, tree.c.depth).join(
+            tree, User.id == tree.c.id
+        ).order_by(tree.c.depth, User.first_name).all()
+        
+        nodes = {}
+        roots = []
+        for user, depth in rows:
+            if user.id in nodes:
+                continue
+            node = nodes[user.id] = {'user': user.to_dict(), 'reports': []}
+            if depth == 0:
+                roots.append(node)
+            else:
+                nodes[user.manager_id]['reports'].append(node)
+        
+        order = {root_id: position for position, root_id in enumerate(root_ids)}
+        return sorted(roots, key=lambda node: order[node['user']['id']])
+    
     def to_dict(self, include_sensitive=False):
         data = {
             'id': self.id,
@@ -117,7 +205,7 @@ class User(UserMixin, db.Model):
             'full_name': self.full_name,
             'role': self.role,
             'department_id': self.department_id,
-            'department': self.department.to_dict() if self.department else None,
+            'department': _department_dict(self.department_id),
             'manager_id': self.manager_id,
             'employee_id': self.employee_id,
             'phone': self.phone,
@@ -130,6 +218,19 @@ class User(UserMixin, db.Model):
         return data
 
 
+class UserHierarchy(db.Model):
+    """Closure table of the management chain: every (ancestor, descendant) pair and its distance"""
+    __tablename__ = 'user_hierarchy'
+    
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_user_hierarchy_descendant', 'descendant_id', 'depth'),
+    )
+
+
 class SeparationCase(db.Model):
     """Main separation case tracking"""
     __tablename__ = 'separation_cases'
@@ -155,6 +256,14 @@ class SeparationCase(db.Model):
     # Notes
     notes = db.Column(db.Text)
     
+    # Denormalized progress counters, kept in step by the checklist and sign-off write paths
+    checklist_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    checklist_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    signoffs_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    signoffs_approved = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    signoffs_rejected = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    signoffs_pending = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     employee = db.relationship('User', foreign_keys=[employee_id], back_populates='separation_cases')
     direct_manager = db.relationship('User', foreign_keys=[direct_manager_id], back_populates='managed_cases')
@@ -166,31 +275,86 @@ class SeparationCase(db.Model):
     handover_schedules = db.relationship('HandoverSchedule', back_populates='separation_case',
                                          lazy='dynamic', cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('ix_separation_cases_employee_status', 'employee_id', 'status'),
+        db.Index('ix_separation_cases_manager_created', 'direct_manager_id', 'created_at'),
+        db.Index('ix_separation_cases_status_created', 'status', 'created_at'),
+        db.Index('ix_separation_cases_created', 'created_at', 'id'),
+        # Partial index for the "one active case per employee" lookup
+        db.Index('ix_separation_cases_active_employee', 'employee_id',
+                 postgresql_where=status.notin_([CaseStatus.COMPLETED, CaseStatus.CANCELLED]),
+                 sqlite_where=status.notin_([CaseStatus.COMPLETED, CaseStatus.CANCELLED])),
+    )
+    
     def generate_case_number(self):
         """Generate unique case number"""
-        from datetime import datetime
-        year = datetime.now().year
-        count = SeparationCase.query.filter(
-            db.extract('year', SeparationCase.created_at) == year
-        ).count() + 1
-        self.case_number = f"SEP-{year}-{count:04d}"
+        from app.services.case_number_service import CaseNumberService
+        self.case_number = CaseNumberService.next_case_number(datetime.now().year)
         return self.case_number
     
     def get_progress(self):
         """Calculate separation progress percentage"""
-        total_items = self.checklist_items.count()
-        if total_items == 0:
+        if not self.checklist_total:
             return 0
-        completed_items = self.checklist_items.filter_by(is_completed=True).count()
-        return int((completed_items / total_items) * 100)
+        return int((self.checklist_completed / self.checklist_total) * 100)
     
     def get_signoff_progress(self):
         """Calculate sign-off progress"""
-        total_signoffs = self.signoffs.count()
-        if total_signoffs == 0:
+        if not self.signoffs_total:
             return 0
-        approved_signoffs = self.signoffs.filter_by(status=SignOffStatus.APPROVED).count()
-        return int((approved_signoffs / total_signoffs) * 100)
+        return int((self.signoffs_approved / self.signoffs_total) * 100)
+    
+    def adjust_checklist_counters(self, total=0, completed=0):
+        """Apply a delta to the checklist counters as an atomic column update"""
+        if total:
+            self.checklist_total = SeparationCase.checklist_total + total
+        if completed:
+            self.checklist_completed = SeparationCase.checklist_completed + completed
+    
+    def adjust_signoff_counters(self, old_status=None, new_status=None):
+        """Move a sign-off between status counters.
+        
+        ``old_status=None`` records a new sign-off, ``new_status=None`` a removed one.
+        """
+        if old_status == new_status:
+            return
+        if old_status is None:
+            self.signoffs_total = SeparationCase.signoffs_total + 1
+        elif new_status is None:
+            self.signoffs_total = SeparationCase.signoffs_total - 1
+        if old_status is not None:
+            column = SIGNOFF_STATUS_COUNTERS[old_status]
+            setattr(self, column, getattr(SeparationCase, column) - 1)
+        if new_status is not None:
+            column = SIGNOFF_STATUS_COUNTERS[new_status]
+            setattr(self, column, getattr(SeparationCase, column) + 1)
+    
+    @staticmethod
+    def rebuild_progress_counters():
+        """Recompute every case's progress counters from the checklist and sign-off tables"""
+        def count(model, *criteria):
+            return db.select(db.func.count(model.id)).where(
+                model.separation_case_id == SeparationCase.id, *criteria
+            ).scalar_subquery()
+        
+        result = db.session.execute(db.update(SeparationCase).values(
+            checklist_total=count(ChecklistItem),
+            checklist_completed=count(ChecklistItem, ChecklistItem.is_completed == True),
+            signoffs_total=count(SignOff),
+            signoffs_approved=count(SignOff, SignOff.status == SignOffStatus.APPROVED),
+            signoffs_rejected=count(SignOff, SignOff.status == SignOffStatus.REJECTED),
+            signoffs_pending=count(SignOff, SignOff.status == SignOffStatus.PENDING),
+        ).execution_options(synchronize_session=False))
+        db.session.commit()
+        return result.rowcount
+    
+    @staticmethod
+    def list_load_options():
+        """Eager-load options for serializing a page of cases without per-row lazy loads"""
+        return (
+            selectinload(SeparationCase.employee),
+            selectinload(SeparationCase.direct_manager),
+        )
     
     def to_dict(self, include_details=False):
         data = {
@@ -218,6 +382,60 @@ class SeparationCase(db.Model):
         return data
 
 
+class CaseNumberSequence(db.Model):
+    """Per-year counter for separation case numbers"""
+    __tablename__ = 'case_number_sequences'
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CatalogVersion(db.Model):
+    """Version counters for catalogues cached in every worker process"""
+    __tablename__ = 'catalog_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def current(name):
+        return db.session.query(CatalogVersion.version).filter_by(name=name).scalar() or 0
+    
+    @staticmethod
+    def bump(name):
+        """Increment a catalogue's version as part of the current transaction"""
+        from app.dialects import upsert_insert
+        db.session.execute(upsert_insert(CatalogVersion).values(name=name, version=1).on_conflict_do_update(
+            index_elements=['name'],
+            set_={'version': CatalogVersion.version + 1}
+        ))
+
+
+class TokenGeneration(db.Model):
+    """Per-user token generation; tokens carrying an older generation are revoked"""
+    __tablename__ = 'token_generations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def current(user_id):
+        return db.session.query(TokenGeneration.generation).filter_by(user_id=user_id).scalar() or 0
+    
+    @staticmethod
+    def bump(user_id):
+        """Revoke every token issued so far for a user as part of the current transaction"""
+        from app.dialects import upsert_insert
+        now = datetime.utcnow()
+        db.session.execute(upsert_insert(TokenGeneration).values(
+            user_id=user_id, generation=1, revoked_at=now
+        ).on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'generation': TokenGeneration.generation + 1, 'revoked_at': now}
+        ))
+
+
 class ChecklistTemplate(db.Model):
     """Reusable checklist templates"""
     __tablename__ = 'checklist_templates'
@@ -244,7 +462,7 @@ class ChecklistTemplate(db.Model):
             'description': self.description,
             'category': self.category,
             'department_id': self.department_id,
-            'department': self.department.to_dict() if self.department else None,
+            'department': _department_dict(self.department_id),
             'is_mandatory': self.is_mandatory,
             'order': self.order,
             'is_active': self.is_active
@@ -277,6 +495,33 @@ class ChecklistItem(db.Model):
     template = db.relationship('ChecklistTemplate')
     completer = db.relationship('User', foreign_keys=[completed_by])
     
+    __table_args__ = (
+        db.Index('ix_checklist_items_case_order', 'separation_case_id', 'order'),
+        db.Index('ix_checklist_items_case_mandatory', 'separation_case_id', 'is_mandatory', 'is_completed'),
+    )
+    
+    @staticmethod
+    def create_from_templates(separation_case_id):
+        """Copy every active template into a case's checklist with one INSERT ... SELECT.
+        
+        Returns the number of items created.
+        """
+        templates = db.select(
+            db.literal(separation_case_id),
+            ChecklistTemplate.id,
+            ChecklistTemplate.name,
+            ChecklistTemplate.description,
+            ChecklistTemplate.category,
+            ChecklistTemplate.is_mandatory,
+            ChecklistTemplate.order
+        ).where(ChecklistTemplate.is_active == True)
+        
+        result = db.session.execute(db.insert(ChecklistItem).from_select(
+            ['separation_case_id', 'template_id', 'name', 'description', 'category', 'is_mandatory', 'order'],
+            templates
+        ))
+        return result.rowcount
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -314,12 +559,21 @@ class SignOff(db.Model):
     department = db.relationship('Department')
     assignee = db.relationship('User', foreign_keys=[assigned_to])
     
+    __table_args__ = (
+        db.Index('ix_signoffs_assignee_status', 'assigned_to', 'status'),
+        db.Index('ix_signoffs_case_status', 'separation_case_id', 'status'),
+        # Partial index backing the pending sign-off queue
+        db.Index('ix_signoffs_pending_queue', 'assigned_to', 'assigned_at', 'id',
+                 postgresql_where=status == SignOffStatus.PENDING,
+                 sqlite_where=status == SignOffStatus.PENDING),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'separation_case_id': self.separation_case_id,
             'department_id': self.department_id,
-            'department': self.department.to_dict() if self.department else None,
+            'department': _department_dict(self.department_id),
             'assigned_to': self.assigned_to,
             'assignee': self.assignee.to_dict() if self.assignee else None,
             'status': self.status,
@@ -357,6 +611,7 @@ class HandoverSchedule(db.Model):
     # Relationships
     separation_case = db.relationship('SeparationCase', back_populates='handover_schedules')
     organizer = db.relationship('User', foreign_keys=[organizer_id])
+    attendances = db.relationship('HandoverAttendee', back_populates='schedule', cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -379,6 +634,52 @@ class HandoverSchedule(db.Model):
         }
 
 
+class HandoverAttendee(db.Model):
+    """A handover participant, organizer or attendee, with their response and the time the schedule books"""
+    __tablename__ = 'handover_attendees'
+    
+    schedule_id = db.Column(db.Integer, db.ForeignKey('handover_schedules.id'), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)  # not a foreign key: attendees are unchecked IDs
+    response_status = db.Column(db.String(20), nullable=False, default=ResponseStatus.NEEDS_ACTION)
+    
+    # Copied from the schedule so per-user date and overlap queries stay on this table's index
+    scheduled_date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    schedule = db.relationship('HandoverSchedule', back_populates='attendances')
+    
+    __table_args__ = (
+        # Serves "my meetings" by date and covers overlap checks: one range scan per user
+        db.Index('ix_handover_attendees_user_date', 'user_id', 'scheduled_date', 'start_time', 'end_time'),
+    )
+
+
+class CalendarSyncOp(db.Model):
+    """Pending calendar provider change for a handover schedule, applied by the calendar worker"""
+    __tablename__ = 'calendar_sync_queue'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, nullable=False)  # not a foreign key: deletes outlive the schedule
+    operation = db.Column(db.String(10), nullable=False)  # create, update, delete
+    calendar_event_id = db.Column(db.String(100))
+    
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_calendar_sync_queue_schedule', 'schedule_id', 'status'),
+        db.Index('ix_calendar_sync_queue_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
 class EmailLog(db.Model):
     """Email audit trail"""
     __tablename__ = 'email_logs'
@@ -390,11 +691,16 @@ class EmailLog(db.Model):
     recipient_name = db.Column(db.String(100))
     subject = db.Column(db.String(200), nullable=False)
     template_name = db.Column(db.String(100))
-    status = db.Column(db.String(20), default='sent')  # sent, failed, pending
+    status = db.Column(db.String(20), default='sent')  # sent, failed
     error_message = db.Column(db.Text)
     
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_email_logs_case_sent', 'separation_case_id', 'sent_at'),
+        db.Index('ix_email_logs_sent_template', 'sent_at', 'template_name'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -406,3 +712,60 @@ class EmailLog(db.Model):
             'status': self.status,
             'sent_at': self.sent_at.isoformat() if self.sent_at else None
         }
+
+
+class EmailOutbox(db.Model):
+    """Rendered emails waiting for the mail worker, written with the change that caused them.
+    
+    Rows that reach ``sent`` or ``failed`` are moved to ``email_logs`` in bulk
+    by ``EmailService.flush_logs``.
+    """
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    separation_case_id = db.Column(db.Integer, db.ForeignKey('separation_cases.id'), nullable=True)
+    
+    recipient_email = db.Column(db.String(120), nullable=False)
+    recipient_name = db.Column(db.String(100))
+    subject = db.Column(db.String(200), nullable=False)
+    template_name = db.Column(db.String(100))
+    body = db.Column(db.Text, nullable=False)
+    summary = db.Column(db.String(300))  # one line in a digest
+    link = db.Column(db.String(500))
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_recipient_status', 'recipient_email', 'status', 'next_attempt_at'),
+    )
+
+
+class ReportDailyDepartment(db.Model):
+    """Daily reporting rollup per department (department_id 0 means no department)"""
+    __tablename__ = 'report_daily_department'
+    
+    day = db.Column(db.Date, primary_key=True)
+    department_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    
+    cases_opened = db.Column(db.Integer, nullable=False, default=0)
+    cases_completed = db.Column(db.Integer, nullable=False, default=0)
+    cases_cancelled = db.Column(db.Integer, nullable=False, default=0)
+    completion_days_total = db.Column(db.Integer, nullable=False, default=0)
+    signoffs_completed = db.Column(db.Integer, nullable=False, default=0)
+    signoff_hours_total = db.Column(db.Float, nullable=False, default=0)
+
+
+class ReportCompletionDays(db.Model):
+    """Histogram of days from resignation to completion, per completion day and department"""
+    __tablename__ = 'report_completion_days'
+    
+    day = db.Column(db.Date, primary_key=True)
+    department_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    days = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cases = db.Column(db.Integer, nullable=False, default=0)
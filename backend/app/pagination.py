@@ -0,0 +1,79 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import json
+from datetime import date, datetime
+from app import db
+from app.cache import TTLCache
+
+
+# Approximate totals for cursor listings, keyed by listing and filter scope
+_total_cache = TTLCache(maxsize=2048, ttl=60)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque token"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Decode a cursor token back into values typed for ``columns``"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise InvalidCursor('Invalid cursor')
+        values = []
+        for column, value in zip(columns, payload):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise InvalidCursor('Invalid cursor')
+            values.append(value)
+        return values
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after(columns, values, descending):
+    """Build the row-value comparison ``(columns) > (values)`` in sort direction"""
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return db.or_(beyond, db.and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def keyset_paginate(query, columns, cursor=None, limit=20, descending=False):
+    """Fetch one page of ``query`` ordered by ``columns`` starting after ``cursor``.
+    
+    ``columns`` must end with a unique column (normally the primary key) so the
+    order is total. Returns ``(items, next_cursor)``; ``next_cursor`` is None on
+    the last page.
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    
+    order = [column.desc() if descending else column.asc() for column in columns]
+    items = query.order_by(*order).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    return items, next_cursor
+
+
+def approximate_total(key, query, ttl=None):
+    """Count ``query`` at most once per ``ttl`` seconds for a given cache ``key``"""
+    return _total_cache.get_or_set(key, lambda: query.order_by(None).count(), ttl=ttl)
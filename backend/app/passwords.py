@@ -0,0 +1,71 @@
+"""
+Password hashing offloaded to a bounded process pool
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_method_prefixes = {}
+
+
+def _executor():
+    """This process's hashing pool, or None when ``PASSWORD_HASH_WORKERS`` is 0"""
+    global _pool, _pool_pid
+    workers = current_app.config['PASSWORD_HASH_WORKERS']
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        # A pool inherited through fork (e.g. gunicorn preload) belongs to the parent
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _run(func, *args):
+    pool = _executor()
+    if pool is None:
+        return func(*args)
+    return pool.submit(func, *args).result()
+
+
+def _hash_method():
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+
+def hash_password(password):
+    """Hash ``password`` with the configured method and cost"""
+    return _run(generate_password_hash, password, _hash_method())
+
+
+def hash_passwords(passwords):
+    """Hash many passwords, spreading them across the pool"""
+    method = _hash_method()
+    pool = _executor()
+    if pool is None:
+        return [generate_password_hash(password, method) for password in passwords]
+    return list(pool.map(generate_password_hash, passwords, [method] * len(passwords), chunksize=8))
+
+
+def verify_password(password_hash, password):
+    """Check ``password`` against a stored hash; accounts without one never match"""
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True if ``password_hash`` was made with a method or cost other than the configured one"""
+    method = _hash_method()
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        # Let Werkzeug fill in default parameters, e.g. "scrypt" -> "scrypt:32768:8:1"
+        prefix = generate_password_hash('', method).split('$', 1)[0]
+        _method_prefixes[method] = prefix
+    return bool(password_hash) and password_hash.split('$', 1)[0] != prefix
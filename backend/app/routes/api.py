@@ -1,16 +1,27 @@
 """
 REST API Routes for Employee Separation Management
 """
-from datetime import datetime
-from flask import Blueprint, request, jsonify
+import io
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, jsonify, current_app, url_for
+from sqlalchemy.orm import selectinload
 from app import db
 from app.models import (
     User, Department, SeparationCase, ChecklistItem, ChecklistTemplate,
-    SignOff, HandoverSchedule, EmailLog, UserRole, CaseStatus, SignOffStatus
+    SignOff, HandoverSchedule, HandoverAttendee, EmailLog, UserRole, CaseStatus, SignOffStatus, ResponseStatus
 )
-from app.routes.auth import token_required, role_required
+from app.routes.auth import token_required, role_required, invalidate_principal
+from app.pagination import keyset_paginate, approximate_total, InvalidCursor
 from app.services.email_service import EmailService
-from app.services.calendar_service import CalendarService
+from app.services.calendar_feed_service import CalendarFeedService
+from app.services.calendar_sync_service import CalendarSyncService
+from app.services.catalog_service import CatalogService
+from app.services.dashboard_service import DashboardService
+from app.services.handover_service import HandoverService
+from app.services.hierarchy_service import HierarchyService, HierarchyCycleError
+from app.services.reporting_service import ReportingService
+from app.services.token_service import TokenService
+from app.services.user_import_service import UserImportService
 
 api_bp = Blueprint('api', __name__)
 
@@ -20,16 +31,29 @@ api_bp = Blueprint('api', __name__)
 @api_bp.route('/separations', methods=['GET'])
 @token_required
 def get_separations():
-    """Get separation cases based on user role"""
+    """Get separation cases based on user role.
+    
+    Passing ``cursor`` (empty for the first page) switches to keyset pagination
+    on ``(created_at, id)``; add ``include_total=true`` for a cached approximate total.
+    ``under`` restricts the list to employees anywhere below a manager.
+    """
     user = request.current_user
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     status = request.args.get('status')
+    cursor = request.args.get('cursor')
+    
+    under, error = get_under_param(user)
+    if error:
+        return error
     
     query = SeparationCase.query
     
     # Filter based on role
-    if user.role == UserRole.EMPLOYEE:
+    if under:
+        # Cases of everyone reporting to this manager, directly or indirectly
+        query = query.filter(SeparationCase.employee_id.in_(HierarchyService.subtree_ids(under)))
+    elif user.role == UserRole.EMPLOYEE:
         query = query.filter_by(employee_id=user.id)
     elif user.role == UserRole.DIRECT_MANAGER:
         query = query.filter_by(direct_manager_id=user.id)
@@ -44,7 +68,15 @@ def get_separations():
     if status:
         query = query.filter_by(status=status)
     
-    query = query.order_by(SeparationCase.created_at.desc())
+    if cursor is not None:
+        return cursor_page_response(
+            'cases', query.options(*SeparationCase.list_load_options()),
+            columns=(SeparationCase.created_at, SeparationCase.id),
+            descending=True,
+            total_key=('separations', user.role, None if user.is_separation_manager() else user.id, under, status)
+        )
+    
+    query = query.options(*SeparationCase.list_load_options()).order_by(SeparationCase.created_at.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
@@ -98,27 +130,18 @@ def create_separation():
     case.generate_case_number()
     
     db.session.add(case)
-    db.session.commit()
+    db.session.flush()
+    ReportingService.record_case_opened(case, employee)
     
-    # Create default checklist items from templates
-    templates = ChecklistTemplate.query.filter_by(is_active=True).all()
-    for template in templates:
-        item = ChecklistItem(
-            separation_case_id=case.id,
-            template_id=template.id,
-            name=template.name,
-            description=template.description,
-            category=template.category,
-            is_mandatory=template.is_mandatory,
-            order=template.order
-        )
-        db.session.add(item)
+    # Create default checklist items from templates in the same transaction
+    case.checklist_total = ChecklistItem.create_from_templates(case.id)
     
-    db.session.commit()
-    
-    # Send notification email
+    # Queue notification email
     EmailService.send_case_created_notification(case)
     
+    db.session.commit()
+    DashboardService.invalidate()
+    
     return jsonify({
         'message': 'Separation case created successfully',
         'case': case.to_dict(include_details=True)
@@ -159,9 +182,14 @@ def update_separation(case_id):
     if 'notes' in data:
         case.notes = data['notes']
     if 'status' in data and user.is_separation_manager():
+        old_status = case.status
         case.status = data['status']
+        if case.status == CaseStatus.COMPLETED and not case.completed_at:
+            case.completed_at = datetime.utcnow()
+        ReportingService.record_case_status_change(case, old_status)
     
     db.session.commit()
+    DashboardService.invalidate()
     
     return jsonify({
         'message': 'Case updated successfully',
@@ -207,16 +235,19 @@ def assign_signoff_manager(case_id):
     )
     
     db.session.add(signoff)
+    case.adjust_signoff_counters(new_status=SignOffStatus.PENDING)
     
     # Update case status if needed
     if case.status == CaseStatus.CHECKLIST_SUBMITTED:
         case.status = CaseStatus.SIGNOFF_PENDING
     
-    db.session.commit()
-    
-    # Send notification
+    # Queue notification; the link needs the sign-off id
+    db.session.flush()
     EmailService.send_signoff_assignment_notification(signoff)
     
+    db.session.commit()
+    DashboardService.invalidate()
+    
     return jsonify({
         'message': 'Sign-off manager assigned',
         'signoff': signoff.to_dict()
@@ -264,6 +295,8 @@ def update_checklist_item(case_id, item_id):
     data = request.get_json()
     
     if 'is_completed' in data:
+        if bool(data['is_completed']) != bool(item.is_completed):
+            case.adjust_checklist_counters(completed=1 if data['is_completed'] else -1)
         item.is_completed = data['is_completed']
         if data['is_completed']:
             item.completed_at = datetime.utcnow()
@@ -276,6 +309,7 @@ def update_checklist_item(case_id, item_id):
         item.notes = data['notes']
     
     db.session.commit()
+    DashboardService.invalidate()
     
     return jsonify({
         'message': 'Item updated',
@@ -308,12 +342,14 @@ def submit_checklist(case_id):
     
     case.status = CaseStatus.CHECKLIST_SUBMITTED
     case.checklist_submitted_at = datetime.utcnow()
-    db.session.commit()
     
     # Notify direct manager
     if case.direct_manager:
         EmailService.send_checklist_submitted_notification(case)
     
+    db.session.commit()
+    DashboardService.invalidate()
+    
     return jsonify({
         'message': 'Checklist submitted successfully',
         'case': case.to_dict()
@@ -360,35 +396,34 @@ def process_signoff(case_id, signoff_id):
     if status not in [SignOffStatus.APPROVED, SignOffStatus.REJECTED]:
         return jsonify({'error': 'Invalid status'}), 400
     
+    case = signoff.separation_case
+    old_status = signoff.status
+    case.adjust_signoff_counters(old_status=old_status, new_status=status)
+    
     signoff.status = status
     signoff.comments = data.get('comments')
     signoff.completed_at = datetime.utcnow()
+    ReportingService.record_signoff_completed(signoff, old_status)
     
-    case = signoff.separation_case
+    # Flush the counter update so the case reflects this sign-off
+    db.session.flush()
     
     # Check if all sign-offs are complete
-    pending_signoffs = SignOff.query.filter_by(
-        separation_case_id=case_id,
-        status=SignOffStatus.PENDING
-    ).count()
-    
-    if pending_signoffs == 0:
+    if case.signoffs_pending == 0:
         # Check if any were rejected
-        rejected = SignOff.query.filter_by(
-            separation_case_id=case_id,
-            status=SignOffStatus.REJECTED
-        ).count()
-        
-        if rejected == 0:
+        if case.signoffs_rejected == 0:
+            old_case_status = case.status
             case.status = CaseStatus.COMPLETED
             case.completed_at = datetime.utcnow()
+            ReportingService.record_case_status_change(case, old_case_status)
             EmailService.send_separation_completed_notification(case)
     
-    db.session.commit()
-    
-    # Send notification
+    # Queue notification
     EmailService.send_signoff_processed_notification(signoff)
     
+    db.session.commit()
+    DashboardService.invalidate()
+    
     return jsonify({
         'message': f'Sign-off {status}',
         'signoff': signoff.to_dict(),
@@ -399,17 +434,29 @@ def process_signoff(case_id, signoff_id):
 @api_bp.route('/signoffs/pending', methods=['GET'])
 @token_required
 def get_pending_signoffs():
-    """Get pending sign-offs for current user"""
+    """Get pending sign-offs for current user.
+    
+    Passing ``cursor`` pages the queue oldest first on ``(assigned_at, id)``.
+    """
     user = request.current_user
     
     if not user.is_manager():
         return jsonify({'error': 'Only managers can view sign-offs'}), 403
     
-    query = SignOff.query.filter_by(status=SignOffStatus.PENDING)
+    query = SignOff.query.filter_by(status=SignOffStatus.PENDING).options(
+        selectinload(SignOff.assignee)
+    )
     
     if not user.is_separation_manager():
         query = query.filter_by(assigned_to=user.id)
     
+    if request.args.get('cursor') is not None:
+        return cursor_page_response(
+            'signoffs', query,
+            columns=(SignOff.assigned_at, SignOff.id),
+            total_key=('pending_signoffs', None if user.is_separation_manager() else user.id)
+        )
+    
     signoffs = query.all()
     
     return jsonify({
@@ -460,19 +507,29 @@ def create_handover_schedule(case_id):
         start_time=datetime.strptime(data['start_time'], '%H:%M').time(),
         end_time=datetime.strptime(data['end_time'], '%H:%M').time(),
         location=data.get('location'),
-        meeting_link=data.get('meeting_link'),
+        meeting_link=single_line(data.get('meeting_link')),
         organizer_id=user.id,
         attendees=data.get('attendees', [])
     )
     
+    if current_app.config['HANDOVER_ENFORCE_CONFLICTS']:
+        conflicts = HandoverService.find_conflicts(
+            HandoverService.participants(schedule.organizer_id, schedule.attendees),
+            schedule.scheduled_date, schedule.start_time, schedule.end_time
+        )
+        if conflicts:
+            return jsonify({
+                'error': 'Participants are already booked at this time',
+                'conflicts': visible_conflicts(user, conflicts)
+            }), 409
+    
     db.session.add(schedule)
-    db.session.commit()
+    db.session.flush()
+    HandoverService.sync_attendees(schedule)
     
-    # Create calendar event
-    calendar_event_id = CalendarService.create_event(schedule)
-    if calendar_event_id:
-        schedule.calendar_event_id = calendar_event_id
-        db.session.commit()
+    # The calendar worker creates the event and records its ID on the schedule
+    CalendarSyncService.enqueue(schedule, 'create')
+    db.session.commit()
     
     return jsonify({
         'message': 'Handover scheduled',
@@ -509,7 +566,7 @@ def update_handover_schedule(case_id, schedule_id):
     if 'location' in data:
         schedule.location = data['location']
     if 'meeting_link' in data:
-        schedule.meeting_link = data['meeting_link']
+        schedule.meeting_link = single_line(data['meeting_link'])
     if 'attendees' in data:
         schedule.attendees = data['attendees']
     if 'is_completed' in data:
@@ -517,11 +574,24 @@ def update_handover_schedule(case_id, schedule_id):
     if 'notes' in data:
         schedule.notes = data['notes']
     
+    if {'scheduled_date', 'start_time', 'end_time', 'attendees'} & data.keys():
+        if current_app.config['HANDOVER_ENFORCE_CONFLICTS']:
+            conflicts = HandoverService.find_conflicts(
+                HandoverService.participants(schedule.organizer_id, schedule.attendees),
+                schedule.scheduled_date, schedule.start_time, schedule.end_time,
+                exclude_schedule_id=schedule.id
+            )
+            if conflicts:
+                db.session.rollback()
+                return jsonify({
+                    'error': 'Participants are already booked at this time',
+                    'conflicts': visible_conflicts(user, conflicts)
+                }), 409
+        HandoverService.sync_attendees(schedule)
+    
+    CalendarSyncService.enqueue(schedule, 'update')
     db.session.commit()
     
-    # Update calendar event
-    CalendarService.update_event(schedule)
-    
     return jsonify({
         'message': 'Schedule updated',
         'schedule': schedule.to_dict()
@@ -542,63 +612,169 @@ def delete_handover_schedule(case_id, schedule_id):
     if case.employee_id != user.id and case.direct_manager_id != user.id and not user.is_separation_manager():
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Delete calendar event
-    CalendarService.delete_event(schedule)
-    
+    CalendarSyncService.enqueue(schedule, 'delete')
     db.session.delete(schedule)
     db.session.commit()
     
     return jsonify({'message': 'Schedule deleted'}), 200
 
 
-# ==================== ORGANIZATION ====================
+@api_bp.route('/handover/conflicts', methods=['POST'])
+@token_required
+def check_handover_conflicts():
+    """List existing handovers that overlap a proposed time for its organizer or attendees.
+    
+    Handovers of cases the caller cannot access are reported as busy time only.
+    """
+    user = request.current_user
+    data = request.get_json() or {}
+    
+    try:
+        scheduled_date = datetime.strptime(data['scheduled_date'], '%Y-%m-%d').date()
+        start_time = datetime.strptime(data['start_time'], '%H:%M').time()
+        end_time = datetime.strptime(data['end_time'], '%H:%M').time()
+    except KeyError as e:
+        return jsonify({'error': f'{e.args[0]} is required'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Use YYYY-MM-DD for scheduled_date and HH:MM for start_time and end_time'}), 400
+    if end_time <= start_time:
+        return jsonify({'error': 'end_time must be after start_time'}), 400
+    
+    user_ids = HandoverService.participants(data.get('organizer_id') or user.id, data.get('attendees'))
+    conflicts = HandoverService.find_conflicts(
+        user_ids, scheduled_date, start_time, end_time, exclude_schedule_id=data.get('schedule_id')
+    )
+    
+    return jsonify({
+        'conflicts': visible_conflicts(user, conflicts),
+        'conflicting_user_ids': sorted({conflict['user_id'] for conflict in conflicts})
+    }), 200
 
-@api_bp.route('/organization/tree', methods=['GET'])
+
+@api_bp.route('/handover/free-slots', methods=['GET'])
 @token_required
-def get_organization_tree():
-    """Get organizational hierarchy"""
+def get_handover_free_slots():
+    """Earliest working-hours slots of ``duration`` minutes when every listed user is free"""
     user = request.current_user
+    try:
+        user_ids = {int(user_id) for user_id in request.args.get('users', str(user.id)).split(',') if user_id.strip()}
+    except ValueError:
+        return jsonify({'error': 'users must be a comma-separated list of user IDs'}), 400
+    if not user_ids or len(user_ids) > 50:
+        return jsonify({'error': 'Pass between 1 and 50 users'}), 400
+    
+    start, end, error = get_date_range(default_days=14)
+    if error:
+        return error
+    if (end - start).days > 92:
+        return jsonify({'error': 'The range may span at most 92 days'}), 400
+    
+    duration = request.args.get('duration', 60, type=int)
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    if duration <= 0 or limit <= 0:
+        return jsonify({'error': 'duration and limit must be positive'}), 400
     
-    if user.role == UserRole.EMPLOYEE:
-        # Employees can only see their direct manager
-        if user.manager:
-            return jsonify({
-                'tree': [{
-                    'user': user.manager.to_dict(),
-                    'reports': [user.to_dict()]
-                }]
-            }), 200
-        return jsonify({'tree': []}), 200
+    return jsonify({
+        'users': sorted(user_ids),
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'duration': duration,
+        'slots': HandoverService.free_slots(user_ids, start, end, duration, limit=limit)
+    }), 200
+
+
+@api_bp.route('/handover/mine', methods=['GET'])
+@token_required
+def get_my_handovers():
+    """Handovers the current user organizes or attends between ``from`` and ``to``"""
+    user = request.current_user
+    start, end, error = get_date_range(default_days=7)
+    if error:
+        return error
     
-    # Build tree for managers
-    def build_tree(manager):
-        return {
-            'user': manager.to_dict(),
-            'reports': [build_tree(report) for report in manager.direct_reports if report.is_active]
-        }
+    schedules = []
+    for schedule, response_status in HandoverService.attending(user.id, start, end):
+        data = schedule.to_dict()
+        data['response_status'] = response_status
+        schedules.append(data)
     
-    if user.is_separation_manager():
-        # Full tree from root managers
-        root_managers = User.query.filter(
-            User.manager_id.is_(None),
-            User.is_active == True,
-            User.role.in_([UserRole.DIRECT_MANAGER, UserRole.DEPARTMENT_MANAGER, UserRole.SEPARATION_MANAGER])
-        ).all()
-        tree = [build_tree(m) for m in root_managers]
-    else:
-        # Only this manager's team
-        tree = [build_tree(user)]
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'schedules': schedules
+    }), 200
+
+
+@api_bp.route('/handover/<int:schedule_id>/response', methods=['PUT'])
+@token_required
+def respond_to_handover(schedule_id):
+    """Accept, tentatively accept or decline a handover the current user attends"""
+    user = request.current_user
+    attendance = HandoverAttendee.query.filter_by(schedule_id=schedule_id, user_id=user.id).first_or_404()
+    
+    data = request.get_json() or {}
+    if data.get('response_status') not in ResponseStatus.all_statuses():
+        return jsonify({'error': f"response_status must be one of {', '.join(ResponseStatus.all_statuses())}"}), 400
     
-    return jsonify({'tree': tree}), 200
+    attendance.response_status = data['response_status']
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Response recorded',
+        'schedule_id': schedule_id,
+        'response_status': attendance.response_status
+    }), 200
+
+
+# ==================== CALENDAR FEED ====================
+
+@api_bp.route('/calendar/feed', methods=['GET'])
+@token_required
+def get_calendar_feed_url():
+    """Subscription URL of the current user's ICS feed"""
+    user = request.current_user
+    token = CalendarFeedService.get_or_create_token(user)
+    return jsonify({'url': url_for('api.get_calendar_feed', token=token, _external=True)}), 200
+
+
+@api_bp.route('/calendar/feed/rotate', methods=['POST'])
+@token_required
+def rotate_calendar_feed_url():
+    """Issue a new feed URL; calendars subscribed to the old one stop updating"""
+    user = request.current_user
+    token = CalendarFeedService.rotate_token(user)
+    return jsonify({
+        'message': 'Calendar feed URL replaced',
+        'url': url_for('api.get_calendar_feed', token=token, _external=True)
+    }), 200
+
+
+@api_bp.route('/calendar/<token>.ics', methods=['GET'])
+def get_calendar_feed(token):
+    """ICS feed of a user's handovers and last working days, authorized by the token in its URL"""
+    user = CalendarFeedService.user_for_token(token)
+    if not user:
+        return jsonify({'error': 'Calendar feed not found'}), 404
+    
+    etag = CalendarFeedService.etag(user.id, CalendarFeedService.window_start())
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(CalendarFeedService.feed(user, etag), mimetype='text/calendar')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
+# ==================== ORGANIZATION ====================
+
 @api_bp.route('/departments', methods=['GET'])
 @token_required
 def get_departments():
     """Get all departments"""
-    departments = Department.query.all()
+    departments = CatalogService.get_departments()
     return jsonify({
-        'departments': [d.to_dict() for d in departments]
+        'departments': [departments[key] for key in sorted(departments)]
     }), 200
 
 
@@ -620,6 +796,7 @@ def create_department():
     )
     
     db.session.add(department)
+    CatalogService.departments_changed()
     db.session.commit()
     
     return jsonify({
@@ -634,12 +811,8 @@ def create_department():
 @token_required
 def get_templates():
     """Get checklist templates"""
-    templates = ChecklistTemplate.query.filter_by(is_active=True).order_by(
-        ChecklistTemplate.order
-    ).all()
-    
     return jsonify({
-        'templates': [t.to_dict() for t in templates]
+        'templates': list(CatalogService.get_active_templates())
     }), 200
 
 
@@ -662,6 +835,7 @@ def create_template():
     )
     
     db.session.add(template)
+    CatalogService.templates_changed()
     db.session.commit()
     
     return jsonify({
@@ -693,6 +867,7 @@ def update_template(template_id):
     if 'is_active' in data:
         template.is_active = data['is_active']
     
+    CatalogService.templates_changed()
     db.session.commit()
     
     return jsonify({
@@ -708,6 +883,7 @@ def delete_template(template_id):
     """Delete (deactivate) a checklist template"""
     template = ChecklistTemplate.query.get_or_404(template_id)
     template.is_active = False
+    CatalogService.templates_changed()
     db.session.commit()
     
     return jsonify({'message': 'Template deleted'}), 200
@@ -723,6 +899,10 @@ def get_users():
     role = request.args.get('role')
     department_id = request.args.get('department_id', type=int)
     
+    under, error = get_under_param(user)
+    if error:
+        return error
+    
     query = User.query.filter_by(is_active=True)
     
     if role:
@@ -731,7 +911,9 @@ def get_users():
         query = query.filter_by(department_id=department_id)
     
     # Non-admins can only see users in their department or reports
-    if not user.is_separation_manager():
+    if under:
+        query = query.filter(User.id.in_(HierarchyService.subtree_ids(under)))
+    elif not user.is_separation_manager():
         if user.department_id:
             query = query.filter_by(department_id=user.department_id)
     
@@ -772,6 +954,8 @@ def create_user():
     user.set_password(data['password'])
     
     db.session.add(user)
+    db.session.flush()
+    HierarchyService.add_user(user)
     db.session.commit()
     
     return jsonify({
@@ -780,6 +964,41 @@ def create_user():
     }), 201
 
 
+@api_bp.route('/users/bulk', methods=['POST'])
+@token_required
+@role_required(UserRole.SEPARATION_MANAGER)
+def bulk_create_users():
+    """Import users from a CSV or JSON Lines upload.
+    
+    Accepts a multipart ``file``, a raw ``text/csv`` or ``application/x-ndjson``
+    body, or JSON ``{"users": [...]}``. ``format`` overrides the detected format.
+    """
+    fmt = request.args.get('format')
+    if fmt and fmt not in UserImportService.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(UserImportService.FORMATS)}"}), 400
+    
+    if request.is_json:
+        body = request.get_json()
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Expected a JSON object with a users list'}), 400
+        users = body.get('users')
+        if not isinstance(users, list):
+            return jsonify({'error': 'users must be a list'}), 400
+        rows = (user if isinstance(user, dict) else ValueError('Expected an object') for user in users)
+    else:
+        upload = request.files.get('file')
+        if upload:
+            stream = upload.stream
+            fmt = fmt or ('csv' if (upload.filename or '').lower().endswith('.csv') else 'jsonl')
+        else:
+            stream = request.stream
+            fmt = fmt or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        rows = UserImportService.read_rows(text, fmt)
+    
+    return jsonify(UserImportService.import_rows(rows)), 200
+
+
 @api_bp.route('/users/<int:user_id>', methods=['GET'])
 @token_required
 def get_user(user_id):
@@ -795,6 +1014,7 @@ def update_user(user_id):
     """Update user details"""
     user = User.query.get_or_404(user_id)
     data = request.get_json()
+    claims = (user.role, user.department_id, user.manager_id, user.is_active)
     
     if 'first_name' in data:
         user.first_name = data['first_name']
@@ -805,7 +1025,10 @@ def update_user(user_id):
     if 'department_id' in data:
         user.department_id = data['department_id']
     if 'manager_id' in data:
-        user.manager_id = data['manager_id']
+        try:
+            HierarchyService.set_manager(user, data['manager_id'])
+        except HierarchyCycleError as e:
+            return jsonify({'error': str(e)}), 400
     if 'phone' in data:
         user.phone = data['phone']
     if 'is_active' in data:
@@ -813,7 +1036,12 @@ def update_user(user_id):
     if 'password' in data and data['password']:
         user.set_password(data['password'])
     
+    # Tokens carry these claims, so changing them revokes the user's tokens
+    if (user.role, user.department_id, user.manager_id, user.is_active) != claims or data.get('password'):
+        TokenService.revoke(user.id)
+    
     db.session.commit()
+    invalidate_principal(user.id)
     
     return jsonify({
         'message': 'User updated',
@@ -828,7 +1056,9 @@ def delete_user(user_id):
     """Delete (deactivate) a user"""
     user = User.query.get_or_404(user_id)
     user.is_active = False
+    TokenService.revoke(user.id)
     db.session.commit()
+    invalidate_principal(user.id)
     
     return jsonify({'message': 'User deleted'}), 200
 
@@ -838,42 +1068,42 @@ def delete_user(user_id):
 @api_bp.route('/organization/tree', methods=['GET'])
 @token_required
 def get_org_tree():
-    """Get organizational hierarchy tree"""
+    """Get organizational hierarchy tree.
+    
+    ``root`` starts the tree at another user and ``depth`` limits how many
+    levels of reports below the root are returned.
+    """
     user = request.current_user
+    root_id = request.args.get('root', type=int)
+    depth = request.args.get('depth', type=int)
     
-    def build_tree(manager_id):
-        reports = User.query.filter_by(
-            manager_id=manager_id,
-            is_active=True
-        ).order_by(User.first_name).all()
-        
-        return [{
-            'user': u.to_dict(),
-            'reports': build_tree(u.id) if u.role in [UserRole.DIRECT_MANAGER, UserRole.DEPARTMENT_MANAGER, UserRole.SEPARATION_MANAGER] else []
-        } for u in reports]
-    
-    # Start from top-level managers (no manager) or from current user's reports
-    if user.is_separation_manager():
-        # Get top-level managers
-        top_users = User.query.filter(
+    if user.role == UserRole.EMPLOYEE:
+        # Employees can only see their direct manager
+        if user.manager:
+            return jsonify({
+                'tree': [{
+                    'user': user.manager.to_dict(),
+                    'reports': [user.to_dict()]
+                }]
+            }), 200
+        return jsonify({'tree': []}), 200
+    
+    if root_id:
+        if not user.is_separation_manager() and not HierarchyService.is_in_reporting_line(user.id, root_id):
+            # Managers can only root the tree inside their own reporting line
+            return jsonify({'error': 'Unauthorized'}), 403
+        root_ids = [root_id]
+    elif user.is_separation_manager():
+        # Start from top-level users (no manager)
+        root_ids = [u.id for u in db.session.query(User.id).filter(
             User.manager_id.is_(None),
             User.is_active == True
-        ).order_by(User.first_name).all()
-        
-        tree = [{
-            'user': u.to_dict(),
-            'reports': build_tree(u.id)
-        } for u in top_users]
+        ).order_by(User.first_name)]
     else:
-        # Show current user's direct reports
-        tree = build_tree(user.id)
-        # Add current user as root
-        tree = [{
-            'user': user.to_dict(),
-            'reports': tree
-        }]
+        # Current user as root with their reports
+        root_ids = [user.id]
     
-    return jsonify({'tree': tree}), 200
+    return jsonify({'tree': User.build_org_tree(root_ids, depth)}), 200
 
 
 # ==================== REPORTS ====================
@@ -882,47 +1112,155 @@ def get_org_tree():
 @token_required
 def get_dashboard_stats():
     """Get dashboard statistics"""
-    user = request.current_user
+    return jsonify(DashboardService.get_stats(request.current_user)), 200
+
+
+@api_bp.route('/reports/timeseries', methods=['GET'])
+@token_required
+@role_required(UserRole.SEPARATION_MANAGER)
+def get_report_timeseries():
+    """Case and sign-off metrics per day, week or month from the daily rollups"""
+    interval = request.args.get('interval', 'day')
+    if interval not in ['day', 'week', 'month']:
+        return jsonify({'error': 'interval must be day, week or month'}), 400
     
-    if user.role == UserRole.EMPLOYEE:
-        # Employee stats
-        case = SeparationCase.query.filter_by(employee_id=user.id).first()
-        return jsonify({
-            'has_case': case is not None,
-            'case': case.to_dict() if case else None,
-            'progress': case.get_progress() if case else 0,
-            'signoff_progress': case.get_signoff_progress() if case else 0
-        }), 200
-    
-    # Manager/Admin stats
-    stats = {
-        'total_cases': SeparationCase.query.count(),
-        'active_cases': SeparationCase.query.filter(
-            SeparationCase.status.notin_([CaseStatus.COMPLETED, CaseStatus.CANCELLED])
-        ).count(),
-        'completed_cases': SeparationCase.query.filter_by(status=CaseStatus.COMPLETED).count(),
-        'pending_signoffs': SignOff.query.filter_by(status=SignOffStatus.PENDING).count()
-    }
+    start, end, error = get_report_range()
+    if error:
+        return error
     
-    if not user.is_separation_manager():
-        # Filter by managed cases
-        stats['pending_signoffs'] = SignOff.query.filter_by(
-            assigned_to=user.id,
-            status=SignOffStatus.PENDING
-        ).count()
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'interval': interval,
+        'series': ReportingService.timeseries(
+            start, end, interval, department_id=request.args.get('department_id', type=int)
+        )
+    }), 200
+
+
+@api_bp.route('/reports/departments', methods=['GET'])
+@token_required
+@role_required(UserRole.SEPARATION_MANAGER)
+def get_report_departments():
+    """Case and sign-off metrics per department from the daily rollups"""
+    start, end, error = get_report_range()
+    if error:
+        return error
     
-    # Recent cases
-    recent_cases = SeparationCase.query.order_by(
-        SeparationCase.created_at.desc()
-    ).limit(5).all()
+    departments = ReportingService.by_department(start, end)
+    for row in departments:
+        row['department'] = CatalogService.get_department(row['department_id'])
     
-    stats['recent_cases'] = [c.to_dict() for c in recent_cases]
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'departments': departments
+    }), 200
+
+
+@api_bp.route('/reports/email', methods=['GET'])
+@token_required
+@role_required(UserRole.SEPARATION_MANAGER)
+def get_report_email():
+    """Email delivery success and failure rates per template, plus the current outbox backlog"""
+    start, end, error = get_report_range()
+    if error:
+        return error
     
-    return jsonify(stats), 200
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'templates': EmailService.delivery_stats(start, end),
+        'backlog': EmailService.backlog()
+    }), 200
 
 
 # ==================== HELPER FUNCTIONS ====================
 
+def get_report_range():
+    """Read ``from``/``to`` (YYYY-MM-DD, default the last 365 days); returns ``(start, end, error_response)``"""
+    today = datetime.utcnow().date()
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args \
+            else today - timedelta(days=365)
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else today
+    except ValueError:
+        return None, None, (jsonify({'error': 'Dates must be formatted as YYYY-MM-DD'}), 400)
+    if start > end:
+        return None, None, (jsonify({'error': 'from must not be after to'}), 400)
+    return start, end, None
+
+
+def get_date_range(default_days):
+    """Read ``from``/``to`` (YYYY-MM-DD, default the next ``default_days`` days); returns ``(start, end, error)``"""
+    today = datetime.utcnow().date()
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args else today
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args \
+            else start + timedelta(days=default_days)
+    except ValueError:
+        return None, None, (jsonify({'error': 'Dates must be formatted as YYYY-MM-DD'}), 400)
+    if start > end:
+        return None, None, (jsonify({'error': 'from must not be after to'}), 400)
+    return start, end, None
+
+
+def get_under_param(user):
+    """Read ``?under=<user id>``; returns ``(manager_id, error_response)``.
+    
+    Separation managers may pass any user; other managers only users in their own reporting line.
+    """
+    under = request.args.get('under', type=int)
+    if under is None or user.is_separation_manager():
+        return under, None
+    if not user.is_manager() or not HierarchyService.is_in_reporting_line(user.id, under):
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return under, None
+
+
+def visible_conflicts(user, conflicts):
+    """``conflicts`` with the schedule, case and title removed where ``user`` cannot access the case"""
+    case_ids = {conflict['separation_case_id'] for conflict in conflicts}
+    cases = SeparationCase.query.filter(SeparationCase.id.in_(case_ids)).all() if case_ids else []
+    visible = {case.id for case in cases if can_access_case(user, case)}
+    return [conflict if conflict['separation_case_id'] in visible else {
+        key: conflict[key] for key in ('user_id', 'scheduled_date', 'start_time', 'end_time')
+    } for conflict in conflicts]
+
+
+def single_line(value):
+    """``value`` without CR or LF, which would start new lines in ICS feeds"""
+    if not isinstance(value, str):
+        return value
+    return value.replace('\r', '').replace('\n', '')
+
+
+def cursor_page_response(name, query, columns, descending=False, total_key=None):
+    """Serialize one keyset page of ``query`` under ``name`` with its next cursor"""
+    per_page = max(1, min(request.args.get('per_page', 10, type=int), 100))
+    try:
+        items, next_cursor = keyset_paginate(
+            query, columns,
+            cursor=request.args.get('cursor'),
+            limit=per_page,
+            descending=descending
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    response = {
+        name: [item.to_dict() for item in items],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }
+    if request.args.get('include_total', '').lower() == 'true':
+        response['total'] = approximate_total(
+            total_key, query, ttl=current_app.config['CURSOR_TOTAL_CACHE_TTL']
+        )
+        response['total_is_approximate'] = True
+    return jsonify(response), 200
+
+
 def can_access_case(user, case, write=False):
     """Check if user can access a separation case"""
     if user.is_separation_manager():
@@ -932,6 +1270,10 @@ def can_access_case(user, case, write=False):
     if case.direct_manager_id == user.id:
         return True
     
+    # Managers higher up the employee's reporting line can view the case
+    if user.is_manager() and HierarchyService.is_in_reporting_line(user.id, case.employee_id):
+        return not write
+    
     # Check if user has a sign-off for this case
     signoff = SignOff.query.filter_by(
         separation_case_id=case.id,
@@ -7,10 +7,92 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 import jwt
 from app import db
+from app.cache import TTLCache
 from app.models import User, UserRole
+from app.services.hierarchy_service import HierarchyService
+from app.services.token_service import TokenService
 
 auth_bp = Blueprint('auth', __name__)
 
+# Authenticated principals by (user id, token generation), shared by requests in this worker
+_principal_cache = TTLCache(maxsize=10000)
+
+
+class AuthenticatedUser:
+    """
+    The principal behind a request's token.
+    
+    Holds the fields authorization needs and loads the full ORM ``User`` only
+    when a handler reads or writes anything else.
+    """
+    
+    FIELDS = ('id', 'email', 'role', 'department_id', 'manager_id', 'is_active')
+    __slots__ = FIELDS + ('_user',)
+    
+    is_authenticated = True
+    is_separation_manager = User.is_separation_manager
+    is_manager = User.is_manager
+    
+    def __init__(self, principal):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, principal[field])
+        object.__setattr__(self, '_user', None)
+    
+    @property
+    def user(self):
+        """The ORM ``User``, loaded on first use"""
+        if self._user is None:
+            object.__setattr__(self, '_user', db.session.get(User, self.id))
+        return self._user
+    
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+    
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+        if name in self.FIELDS:
+            object.__setattr__(self, name, value)
+
+
+def _principal_key(user_id):
+    # Role and active flag changes bump the generation, which every worker sees
+    # within CATALOG_VERSION_CHECK_INTERVAL, so the old entry is never read again
+    return user_id, TokenService.revocations.get().get(user_id, 0)
+
+
+def load_principal(user_id):
+    """Authorization fields for ``user_id``, cached for ``AUTH_PRINCIPAL_CACHE_TTL`` seconds"""
+    key = _principal_key(user_id)
+    principal = _principal_cache.get(key)
+    if principal is None:
+        row = db.session.query(
+            *[getattr(User, field) for field in AuthenticatedUser.FIELDS]
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        principal = dict(row._mapping)
+        _principal_cache.set(key, principal, ttl=current_app.config['AUTH_PRINCIPAL_CACHE_TTL'])
+    return principal
+
+
+def principal_from_claims(payload):
+    """Principal carried by a token's signed claims, or None for tokens issued without them"""
+    if 'gen' not in payload:
+        return None
+    return {
+        'id': payload['user_id'],
+        'email': payload['email'],
+        'role': payload['role'],
+        'department_id': payload.get('department_id'),
+        'manager_id': payload.get('manager_id'),
+        'is_active': not TokenService.is_revoked(payload['user_id'], payload['gen'])
+    }
+
+
+def invalidate_principal(user_id):
+    """Drop this worker's cached principal after changing the user"""
+    _principal_cache.invalidate(_principal_key(user_id))
+
 
 def generate_token(user):
     """Generate JWT token for user"""
@@ -18,6 +100,9 @@ def generate_token(user):
         'user_id': user.id,
         'email': user.email,
         'role': user.role,
+        'department_id': user.department_id,
+        'manager_id': user.manager_id,
+        'gen': TokenService.generation(user.id),
         'exp': datetime.utcnow().timestamp() + current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', 86400)
     }
     token = jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
@@ -39,10 +124,17 @@ def token_required(f):
         
         try:
             payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            user = User.query.get(payload['user_id'])
-            if not user or not user.is_active:
+            principal = None
+            if current_app.config['AUTH_STATELESS']:
+                principal = principal_from_claims(payload)
+            if principal is None:
+                principal = load_principal(payload['user_id'])
+                # Tokens issued before a revocation stop working in stateful mode too
+                if principal and 'gen' in payload and TokenService.is_revoked(payload['user_id'], payload['gen']):
+                    principal = None
+            if not principal or not principal['is_active']:
                 return jsonify({'error': 'Invalid or inactive user'}), 401
-            request.current_user = user
+            request.current_user = AuthenticatedUser(principal)
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
@@ -95,6 +187,8 @@ def register():
     user.set_password(data['password'])
     
     db.session.add(user)
+    db.session.flush()
+    HierarchyService.add_user(user)
     db.session.commit()
     
     # Generate token
@@ -126,6 +220,10 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'Account is deactivated'}), 401
     
+    # Upgrade hashes stored with an outdated method or cost
+    if user.password_needs_rehash():
+        user.set_password(password)
+    
     # Update last login
     user.last_login = datetime.utcnow()
     db.session.commit()
@@ -176,6 +274,7 @@ def update_profile():
         user.phone = data['phone']
     
     db.session.commit()
+    invalidate_principal(user.id)
     
     return jsonify({
         'message': 'Profile updated successfully',
@@ -203,9 +302,15 @@ def change_password():
         return jsonify({'error': 'Password must be at least 8 characters'}), 400
     
     user.set_password(new_password)
+    TokenService.revoke(user.id)
     db.session.commit()
+    invalidate_principal(user.id)
     
-    return jsonify({'message': 'Password changed successfully'}), 200
+    # Other sessions are signed out; hand this one a token for the new generation
+    return jsonify({
+        'message': 'Password changed successfully',
+        'token': generate_token(user)
+    }), 200
 
 
 @auth_bp.route('/forgot-password', methods=['POST'])
@@ -275,6 +380,8 @@ def google_login():
                     role=UserRole.EMPLOYEE
                 )
                 db.session.add(user)
+                db.session.flush()
+                HierarchyService.add_user(user)
         
         user.last_login = datetime.utcnow()
         db.session.commit()
@@ -67,7 +67,16 @@ def api_docs():
                 'GET /api/separations/<id>/handover': 'Get schedules',
                 'POST /api/separations/<id>/handover': 'Create schedule',
                 'PUT /api/separations/<id>/handover/<schedule_id>': 'Update schedule',
-                'DELETE /api/separations/<id>/handover/<schedule_id>': 'Delete schedule'
+                'DELETE /api/separations/<id>/handover/<schedule_id>': 'Delete schedule',
+                'POST /api/handover/conflicts': 'Check a proposed time for booking conflicts',
+                'GET /api/handover/free-slots': 'Find times when all listed users are free',
+                'GET /api/handover/mine': 'Handovers the current user attends',
+                'PUT /api/handover/<schedule_id>/response': 'Accept or decline a handover'
+            },
+            'calendar': {
+                'GET /api/calendar/feed': 'Get your ICS feed URL',
+                'POST /api/calendar/feed/rotate': 'Replace your ICS feed URL',
+                'GET /api/calendar/<token>.ics': 'ICS feed of handovers and last working days'
             },
             'organization': {
                 'GET /api/organization/tree': 'Get org hierarchy',
@@ -82,7 +91,10 @@ def api_docs():
                 'DELETE /api/templates/<id>': 'Delete template'
             },
             'reports': {
-                'GET /api/reports/dashboard': 'Dashboard statistics'
+                'GET /api/reports/dashboard': 'Dashboard statistics',
+                'GET /api/reports/timeseries': 'Case and sign-off metrics over time',
+                'GET /api/reports/departments': 'Case and sign-off metrics per department',
+                'GET /api/reports/email': 'Email delivery rates per template'
             }
         }
     }), 200
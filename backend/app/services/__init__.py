@@ -3,5 +3,16 @@ Services package initializer
 """
 from app.services.email_service import EmailService
 from app.services.calendar_service import CalendarService
+from app.services.calendar_feed_service import CalendarFeedService
+from app.services.calendar_sync_service import CalendarSyncService
+from app.services.case_number_service import CaseNumberService
+from app.services.catalog_service import CatalogService
+from app.services.dashboard_service import DashboardService
+from app.services.handover_service import HandoverService
+from app.services.hierarchy_service import HierarchyService
+from app.services.reporting_service import ReportingService
+from app.services.token_service import TokenService
 
-__all__ = ['EmailService', 'CalendarService']
+__all__ = ['EmailService', 'CalendarService', 'CalendarFeedService', 'CalendarSyncService', 'CaseNumberService',
+           'CatalogService', 'DashboardService', 'HandoverService', 'HierarchyService', 'ReportingService',
+           'TokenService']
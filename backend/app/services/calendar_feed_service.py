@@ -0,0 +1,202 @@
+"""
+Per-user iCalendar feeds of handovers and last working days
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app
+from app import db
+from app.cache import TTLCache
+from app.models import HandoverSchedule, HandoverAttendee, SeparationCase, User, CaseStatus, ResponseStatus
+
+
+def _escape(value):
+    """Escape a TEXT value (RFC 5545 section 3.3.11)"""
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\r', '\\n').replace('\n', '\\n')
+
+
+def _uri(value):
+    """URI value with line breaks dropped; URIs have no escapes, so a break would start a new content line"""
+    return value.replace('\r', '').replace('\n', '')
+
+
+def _fold(line):
+    """Split a content line into CRLF-joined chunks of at most 75 octets"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    chunks, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1  # never split a multi-byte character
+        chunks.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74  # continuation lines start with a space
+    return '\r\n '.join(chunks) + '\r\n'
+
+
+def _stamp(value):
+    return (value or datetime.utcnow()).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _utc(day, time_of_day):
+    """UTC DATE-TIME for a handover time entered in ``HANDOVER_TIMEZONE``"""
+    local = datetime.combine(day, time_of_day, tzinfo=ZoneInfo(current_app.config['HANDOVER_TIMEZONE']))
+    return local.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class CalendarFeedService:
+    """
+    Builds the ICS feed behind ``GET /api/calendar/<token>.ics``.
+    
+    A feed's ETag hashes the count and latest ``updated_at`` of the rows it
+    is built from, including the users named in milestones, read with one
+    aggregate query, so polling clients get ``304 Not Modified`` without the
+    feed being rendered. Each worker keeps the last body per user and the
+    rendered VEVENT of each handover and milestone keyed by its
+    ``updated_at``; after a change only the changed events are rendered
+    again. Handover times are sent in UTC, converted from
+    ``HANDOVER_TIMEZONE``.
+    """
+    
+    _feeds = TTLCache(maxsize=5000, ttl=86400)     # user id -> (etag, body)
+    _events = TTLCache(maxsize=50000, ttl=86400)   # (kind, id, updated_at, ...) -> VEVENT text, shared by all feeds
+    
+    @staticmethod
+    def get_or_create_token(user):
+        """The user's feed token, generated on first use"""
+        if not user.calendar_feed_token:
+            user.calendar_feed_token = secrets.token_urlsafe(32)
+            db.session.commit()
+        return user.calendar_feed_token
+    
+    @staticmethod
+    def rotate_token(user):
+        """Replace the user's feed token, so the old feed URL stops working"""
+        user.calendar_feed_token = secrets.token_urlsafe(32)
+        db.session.commit()
+        CalendarFeedService._feeds.invalidate(user.id)
+        return user.calendar_feed_token
+    
+    @staticmethod
+    def user_for_token(token):
+        return User.query.filter_by(calendar_feed_token=token, is_active=True).first()
+    
+    @staticmethod
+    def window_start():
+        """Earliest date in feeds; older events drop out as the window moves"""
+        return datetime.utcnow().date() - timedelta(days=current_app.config['CALENDAR_FEED_PAST_DAYS'])
+    
+    @staticmethod
+    def _handovers(user_id, start):
+        return db.session.query(HandoverSchedule).join(
+            HandoverAttendee, HandoverAttendee.schedule_id == HandoverSchedule.id
+        ).filter(
+            HandoverAttendee.user_id == user_id,
+            HandoverAttendee.scheduled_date >= start,
+            HandoverAttendee.response_status != ResponseStatus.DECLINED
+        )
+    
+    @staticmethod
+    def _milestones(user_id, start):
+        return db.session.query(SeparationCase).filter(
+            db.or_(
+                SeparationCase.employee_id == user_id,
+                SeparationCase.direct_manager_id == user_id,
+                SeparationCase.separation_manager_id == user_id
+            ),
+            SeparationCase.status != CaseStatus.CANCELLED,
+            SeparationCase.last_working_day >= start
+        )
+    
+    @staticmethod
+    def etag(user_id, start):
+        """Strong validator for a user's feed, changing whenever an event in it is added, edited or removed"""
+        handovers = CalendarFeedService._handovers(user_id, start).with_entities(
+            db.func.count(), db.func.max(HandoverSchedule.updated_at), db.func.max(HandoverAttendee.updated_at)
+        ).subquery()
+        # Milestones show the employee's name, so a change to their user row counts too
+        milestones = CalendarFeedService._milestones(user_id, start).join(
+            User, User.id == SeparationCase.employee_id
+        ).with_entities(
+            db.func.count(), db.func.max(SeparationCase.updated_at), db.func.max(User.updated_at)
+        ).subquery()
+        version = db.session.execute(db.select(handovers, milestones).join_from(handovers, milestones, db.true())).one()
+        return hashlib.sha1(f'{user_id}:{start}:{tuple(version)}'.encode()).hexdigest()
+    
+    @staticmethod
+    def feed(user, etag):
+        """ICS text of the user's feed, reused while ``etag`` is unchanged"""
+        cached = CalendarFeedService._feeds.get(user.id)
+        if cached and cached[0] == etag:
+            return cached[1]
+        body = ''.join(CalendarFeedService.render(user, CalendarFeedService.window_start()))
+        CalendarFeedService._feeds.set(user.id, (etag, body))
+        return body
+    
+    @staticmethod
+    def render(user, start):
+        """Yield the feed's lines, streaming handovers and milestones from the database"""
+        yield _fold('BEGIN:VCALENDAR')
+        yield _fold('VERSION:2.0')
+        yield _fold('PRODID:-//Suvadu//Handover Calendar//EN')
+        yield _fold('CALSCALE:GREGORIAN')
+        yield _fold(f'X-WR-CALNAME:{_escape(f"Handovers - {user.full_name}")}')
+        
+        events = CalendarFeedService._events
+        # Plain rows rather than ORM objects: most events are served from the cache
+        for schedule in CalendarFeedService._handovers(user.id, start).with_entities(
+            HandoverSchedule.id, HandoverSchedule.updated_at, HandoverSchedule.title, HandoverSchedule.description,
+            HandoverSchedule.location, HandoverSchedule.meeting_link, HandoverSchedule.scheduled_date,
+            HandoverSchedule.start_time, HandoverSchedule.end_time
+        ).order_by(HandoverAttendee.scheduled_date, HandoverAttendee.start_time).yield_per(500):
+            yield events.get_or_set(('handover', schedule.id, schedule.updated_at),
+                                    lambda: CalendarFeedService._handover_event(schedule))
+        
+        for case in CalendarFeedService._milestones(user.id, start).join(
+            User, User.id == SeparationCase.employee_id
+        ).with_entities(
+            SeparationCase.id, SeparationCase.updated_at, SeparationCase.case_number,
+            SeparationCase.last_working_day, User.first_name, User.last_name
+        ).order_by(SeparationCase.last_working_day).yield_per(500):
+            employee = f'{case.first_name} {case.last_name}'
+            yield events.get_or_set(('last_working_day', case.id, case.updated_at, employee),
+                                    lambda: CalendarFeedService._milestone_event(case, employee))
+        
+        yield _fold('END:VCALENDAR')
+    
+    @staticmethod
+    def _handover_event(schedule):
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:handover-{schedule.id}@suvadu',
+            f'DTSTAMP:{_stamp(schedule.updated_at)}',
+            f'DTSTART:{_utc(schedule.scheduled_date, schedule.start_time)}',
+            f'DTEND:{_utc(schedule.scheduled_date, schedule.end_time)}',
+            f'SUMMARY:{_escape(schedule.title)}',
+        ]
+        if schedule.description:
+            lines.append(f'DESCRIPTION:{_escape(schedule.description)}')
+        if schedule.location:
+            lines.append(f'LOCATION:{_escape(schedule.location)}')
+        if schedule.meeting_link:
+            lines.append(f'URL:{_uri(schedule.meeting_link)}')
+        lines.append('STATUS:CONFIRMED')
+        lines.append('END:VEVENT')
+        return ''.join(_fold(line) for line in lines)
+    
+    @staticmethod
+    def _milestone_event(case, employee):
+        day = case.last_working_day
+        return ''.join(_fold(line) for line in [
+            'BEGIN:VEVENT',
+            f'UID:last-working-day-{case.id}@suvadu',
+            f'DTSTAMP:{_stamp(case.updated_at)}',
+            f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime('%Y%m%d')}",
+            f'SUMMARY:{_escape(f"Last working day: {employee} ({case.case_number})")}',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ])
@@ -1,8 +1,12 @@
 """
 Calendar Service for scheduling handover meetings
 """
+import random
+import threading
+import time
 import uuid
 from datetime import datetime
+from types import SimpleNamespace
 from flask import current_app
 
 
@@ -109,6 +113,26 @@ class CalendarService:
             current_app.logger.error(f"Failed to delete calendar event: {str(e)}")
             return False
     
+    @staticmethod
+    def apply_batch(operations):
+        """
+        Apply ``(operation, schedule, event_id)`` tuples in one provider round trip.
+        
+        For production, send these as a single Google Calendar batch request
+        (up to 50 calls). Returns one result per operation: the event ID for a
+        create, True for an update or delete, or the exception that failed it.
+        """
+        results = []
+        for operation, schedule, event_id in operations:
+            if operation == 'create':
+                result = CalendarService.create_event(schedule)
+            elif operation == 'update':
+                result = CalendarService.update_event(schedule)
+            else:
+                result = CalendarService.delete_event(SimpleNamespace(calendar_event_id=event_id))
+            results.append(result if result else RuntimeError(f'Calendar {operation} failed'))
+        return results
+    
     @staticmethod
     def get_event(event_id):
         """
@@ -182,6 +206,52 @@ class CalendarService:
             return False
 
 
+class FakeCalendarProvider:
+    """
+    In-memory calendar for exercising the sync worker offline.
+    
+    Each ``apply_batch`` call sleeps ``CALENDAR_FAKE_LATENCY`` seconds, like one
+    HTTP round trip, and fails each operation with probability
+    ``CALENDAR_FAKE_FAILURE_RATE``. ``events``, ``calls`` and ``operations``
+    record what the worker sent.
+    """
+    
+    events = {}
+    calls = 0
+    operations = 0
+    _lock = threading.Lock()
+    
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.events, cls.calls, cls.operations = {}, 0, 0
+    
+    @classmethod
+    def apply_batch(cls, operations):
+        time.sleep(current_app.config['CALENDAR_FAKE_LATENCY'])
+        failure_rate = current_app.config['CALENDAR_FAKE_FAILURE_RATE']
+        results = []
+        with cls._lock:
+            cls.calls += 1
+            cls.operations += len(operations)
+            for operation, schedule, event_id in operations:
+                if random.random() < failure_rate:
+                    results.append(RuntimeError('Fake provider failure'))
+                elif operation == 'create':
+                    event_id = f"fake_{uuid.uuid4().hex[:12]}"
+                    cls.events[event_id] = {'schedule_id': schedule.id, 'title': schedule.title}
+                    results.append(event_id)
+                elif event_id not in cls.events:
+                    results.append(LookupError(f'Unknown event {event_id}'))
+                elif operation == 'update':
+                    cls.events[event_id] = {'schedule_id': schedule.id, 'title': schedule.title}
+                    results.append(True)
+                else:
+                    del cls.events[event_id]
+                    results.append(True)
+        return results
+
+
 def get_google_calendar_service():
     """
     Get authenticated Google Calendar service.
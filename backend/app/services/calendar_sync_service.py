@@ -0,0 +1,148 @@
+"""
+Queued calendar synchronisation for handover schedules
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import CalendarSyncOp, HandoverSchedule
+from app.services.calendar_service import CalendarService, FakeCalendarProvider
+
+
+PROVIDERS = {
+    'mock': CalendarService,
+    'fake': FakeCalendarProvider,
+}
+
+
+class CalendarSyncService:
+    """
+    Queues calendar changes in ``calendar_sync_queue`` and applies them in batches.
+    
+    Requests enqueue in their own transaction. A schedule's queued change that
+    no worker has claimed yet absorbs later ones: create + update stays a
+    create, create + delete cancels both and update + delete becomes a delete.
+    ``flask run-calendar-worker`` applies a schedule's changes in order.
+    """
+    
+    @staticmethod
+    def provider():
+        return PROVIDERS[current_app.config['CALENDAR_PROVIDER']]
+    
+    @staticmethod
+    def enqueue(schedule, operation):
+        """Queue ``operation`` for a flushed schedule in the caller's transaction"""
+        queued = CalendarSyncOp.query.filter_by(
+            schedule_id=schedule.id, status='pending', claimed_at=None
+        ).order_by(CalendarSyncOp.id.desc()).first()
+        
+        if queued and queued.operation == 'create':
+            if operation == 'delete':
+                db.session.delete(queued)
+            return
+        if queued and queued.operation == 'update':
+            queued.operation = operation
+            return
+        db.session.add(CalendarSyncOp(
+            schedule_id=schedule.id,
+            operation=operation,
+            calendar_event_id=schedule.calendar_event_id
+        ))
+    
+    @staticmethod
+    def process_pending(batch_size=50):
+        """Apply one batch of due changes with a single provider call.
+        
+        Only the oldest pending change of each schedule is eligible, so changes
+        to one schedule are applied in order. Returns the number claimed.
+        """
+        config = current_app.config
+        now = datetime.utcnow()
+        earlier = db.aliased(CalendarSyncOp)
+        due = db.select(CalendarSyncOp.id).where(
+            CalendarSyncOp.status == 'pending',
+            CalendarSyncOp.next_attempt_at <= now,
+            db.or_(
+                CalendarSyncOp.claimed_at.is_(None),
+                CalendarSyncOp.claimed_at < now - timedelta(seconds=config['CALENDAR_SYNC_LEASE'])
+            ),
+            ~db.select(earlier.id).where(
+                earlier.schedule_id == CalendarSyncOp.schedule_id,
+                earlier.status == 'pending',
+                earlier.id < CalendarSyncOp.id
+            ).exists()
+        ).order_by(CalendarSyncOp.next_attempt_at, CalendarSyncOp.id).limit(batch_size)
+        claimed = db.session.execute(db.update(CalendarSyncOp).where(
+            CalendarSyncOp.id.in_(due.scalar_subquery()),
+            db.or_(
+                CalendarSyncOp.claimed_at.is_(None),
+                CalendarSyncOp.claimed_at < now - timedelta(seconds=config['CALENDAR_SYNC_LEASE'])
+            )
+        ).values(claimed_at=now).returning(CalendarSyncOp.id)).scalars().all()
+        db.session.commit()
+        if not claimed:
+            return 0
+        
+        ops = CalendarSyncOp.query.filter(CalendarSyncOp.id.in_(claimed)).order_by(CalendarSyncOp.id).all()
+        schedules = {schedule.id: schedule for schedule in HandoverSchedule.query.filter(
+            HandoverSchedule.id.in_({op.schedule_id for op in ops})
+        )}
+        
+        calls, done = [], []
+        for op in ops:
+            schedule = schedules.get(op.schedule_id)
+            event_id = op.calendar_event_id or (schedule.calendar_event_id if schedule else None)
+            operation = op.operation
+            if operation == 'update' and not event_id:
+                # The create never reached the provider; create the event now
+                operation = 'create'
+            if (operation != 'delete' and schedule is None) or (operation == 'delete' and not event_id):
+                # Nothing left to sync: the schedule is gone or its event was never created
+                done.append(op)
+                continue
+            calls.append((op, operation, schedule, event_id))
+        
+        results = []
+        if calls:
+            try:
+                results = CalendarSyncService.provider().apply_batch(
+                    [(operation, schedule, event_id) for _, operation, schedule, event_id in calls]
+                )
+            except Exception as e:
+                current_app.logger.error(f"Calendar sync batch failed: {str(e)}")
+                results = [e] * len(calls)
+        
+        for op in done:
+            db.session.delete(op)
+        for (op, operation, schedule, _), result in zip(calls, results):
+            if isinstance(result, Exception):
+                CalendarSyncService._record_failure(op, result)
+                continue
+            if operation == 'create':
+                CalendarSyncService._record_event_id(op.schedule_id, result)
+            db.session.delete(op)
+        db.session.commit()
+        return len(claimed)
+    
+    @staticmethod
+    def _record_event_id(schedule_id, event_id):
+        """Store a created event's ID on the schedule and on its changes queued behind the create"""
+        db.session.execute(db.update(HandoverSchedule).where(
+            HandoverSchedule.id == schedule_id
+        ).values(calendar_event_id=event_id).execution_options(synchronize_session=False))
+        db.session.execute(db.update(CalendarSyncOp).where(
+            CalendarSyncOp.schedule_id == schedule_id,
+            CalendarSyncOp.calendar_event_id.is_(None)
+        ).values(calendar_event_id=event_id).execution_options(synchronize_session=False))
+    
+    @staticmethod
+    def _record_failure(op, error):
+        """Retry with exponential backoff, or give up after ``CALENDAR_SYNC_MAX_ATTEMPTS``"""
+        config = current_app.config
+        op.attempts += 1
+        op.last_error = str(error)
+        op.claimed_at = None
+        if op.attempts >= config['CALENDAR_SYNC_MAX_ATTEMPTS']:
+            op.status = 'failed'
+        else:
+            delay = min(config['CALENDAR_SYNC_RETRY_DELAY'] * 2 ** (op.attempts - 1), 3600)
+            op.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
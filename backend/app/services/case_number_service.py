@@ -0,0 +1,82 @@
+"""
+Case number allocation backed by a per-year sequence table
+"""
+import os
+import threading
+from flask import current_app
+from app import db
+from app.dialects import upsert_insert
+from app.models import CaseNumberSequence, SeparationCase
+
+
+class CaseNumberService:
+    """
+    Hands out SEP-YYYY-NNNN case numbers.
+    
+    Each reservation is a single atomic ``UPDATE ... RETURNING`` on the year's
+    sequence row, run in its own short transaction so the row lock is released
+    before the case itself is written. With ``CASE_NUMBER_BLOCK_SIZE`` above 1
+    each worker process reserves a block of numbers at a time and serves the
+    rest from memory, at the cost of gaps and out-of-order numbers across workers.
+    """
+    
+    _blocks = {}  # (pid, year) -> [next_value, last_value]
+    _lock = threading.Lock()
+    
+    @classmethod
+    def next_case_number(cls, year):
+        """Allocate the next case number for ``year``"""
+        return f"SEP-{year}-{cls.next_value(year):04d}"
+    
+    @classmethod
+    def next_value(cls, year):
+        block_size = max(current_app.config.get('CASE_NUMBER_BLOCK_SIZE', 1), 1)
+        key = (os.getpid(), year)
+        with cls._lock:
+            block = cls._blocks.get(key)
+            if block is None or block[0] > block[1]:
+                last_value = cls.reserve(year, block_size)
+                block = [last_value - block_size + 1, last_value]
+                cls._blocks[key] = block
+            value = block[0]
+            block[0] += 1
+        return value
+    
+    @staticmethod
+    def reserve(year, count=1):
+        """Reserve ``count`` numbers for ``year`` and return the highest one"""
+        increment = db.update(CaseNumberSequence).where(
+            CaseNumberSequence.year == year
+        ).values(
+            last_value=CaseNumberSequence.last_value + count
+        ).returning(CaseNumberSequence.last_value)
+        
+        with db.engine.begin() as conn:
+            last_value = conn.execute(increment).scalar()
+            if last_value is None:
+                # First case of the year: seed the sequence from any existing numbers
+                conn.execute(upsert_insert(CaseNumberSequence).values(
+                    year=year,
+                    last_value=CaseNumberService.highest_existing(conn, year)
+                ).on_conflict_do_nothing(index_elements=['year']))
+                last_value = conn.execute(increment).scalar()
+        return last_value
+    
+    @staticmethod
+    def highest_existing(conn, year):
+        """Highest number already used for ``year``, for databases predating the sequence table"""
+        prefix = f"SEP-{year}-"
+        case_number = conn.execute(
+            db.select(SeparationCase.case_number).where(
+                SeparationCase.case_number.startswith(prefix, autoescape=True)
+            ).order_by(
+                db.func.length(SeparationCase.case_number).desc(),
+                SeparationCase.case_number.desc()
+            ).limit(1)
+        ).scalar()
+        if not case_number:
+            return 0
+        try:
+            return int(case_number[len(prefix):])
+        except ValueError:
+            return 0
@@ -0,0 +1,53 @@
+"""
+Catalogue caches shared across requests
+"""
+from app.cache import FrozenDict, VersionedCatalog
+from app.models import ChecklistTemplate, Department
+
+
+def _load_templates():
+    templates = ChecklistTemplate.query.filter_by(is_active=True).order_by(ChecklistTemplate.order).all()
+    return tuple(template.to_dict() for template in templates)
+
+
+def _load_departments():
+    return {department.id: FrozenDict(department.to_dict()) for department in Department.query.all()}
+
+
+class CatalogService:
+    """Serves the checklist template and department catalogues from memory"""
+    
+    templates = VersionedCatalog('checklist_templates', _load_templates)
+    departments = VersionedCatalog('departments', _load_departments)
+    
+    @staticmethod
+    def get_active_templates():
+        """Serialized active templates, ordered by ``order``"""
+        return CatalogService.templates.get()
+    
+    @staticmethod
+    def templates_changed():
+        """Call before committing any change to checklist templates"""
+        CatalogService.templates.bump()
+    
+    @staticmethod
+    def get_departments():
+        """Registry of department id -> serialized department, including ``parent_id``"""
+        return CatalogService.departments.get()
+    
+    @staticmethod
+    def get_department(department_id):
+        """Serialized department shared by every response, or None"""
+        if department_id is None:
+            return None
+        department = CatalogService.departments.get().get(department_id)
+        if department is None:
+            # May have been created by another worker since our last version check
+            CatalogService.departments.invalidate()
+            department = CatalogService.departments.get().get(department_id)
+        return department
+    
+    @staticmethod
+    def departments_changed():
+        """Call before committing any change to departments"""
+        CatalogService.departments.bump()
@@ -0,0 +1,78 @@
+"""
+Dashboard statistics with short-lived snapshots
+"""
+from flask import current_app
+from app import db
+from app.cache import TTLCache
+from app.models import SeparationCase, SignOff, UserRole, CaseStatus, SignOffStatus
+
+
+class DashboardService:
+    """
+    Builds dashboard statistics from grouped aggregates and caches each scope
+    for ``DASHBOARD_CACHE_TTL`` seconds.
+    
+    The organisation-wide snapshot is shared by every manager; per-user parts
+    (an employee's own case, a manager's pending sign-offs) are cached per user.
+    Case and sign-off writes call ``invalidate()`` to drop this worker's snapshots.
+    """
+    
+    _cache = TTLCache(maxsize=4096)
+    
+    @staticmethod
+    def get_stats(user):
+        if user.role == UserRole.EMPLOYEE:
+            return DashboardService._cached(('employee', user.id), lambda: DashboardService.employee_stats(user.id))
+        
+        stats = dict(DashboardService._cached(('organization',), DashboardService.organization_stats))
+        if not user.is_separation_manager():
+            # Filter by managed cases
+            stats['pending_signoffs'] = DashboardService._cached(
+                ('pending_signoffs', user.id), lambda: DashboardService.pending_signoffs_for(user.id)
+            )
+        return stats
+    
+    @staticmethod
+    def invalidate():
+        DashboardService._cache.clear()
+    
+    @staticmethod
+    def _cached(key, factory):
+        return DashboardService._cache.get_or_set(key, factory, ttl=current_app.config['DASHBOARD_CACHE_TTL'])
+    
+    @staticmethod
+    def employee_stats(user_id):
+        case = SeparationCase.query.filter_by(employee_id=user_id).first()
+        return {
+            'has_case': case is not None,
+            'case': case.to_dict() if case else None,
+            'progress': case.get_progress() if case else 0,
+            'signoff_progress': case.get_signoff_progress() if case else 0
+        }
+    
+    @staticmethod
+    def organization_stats():
+        cases_by_status = dict(db.session.query(
+            SeparationCase.status, db.func.count(SeparationCase.id)
+        ).group_by(SeparationCase.status).all())
+        signoffs_by_status = dict(db.session.query(
+            SignOff.status, db.func.count(SignOff.id)
+        ).group_by(SignOff.status).all())
+        
+        recent_cases = SeparationCase.query.options(
+            *SeparationCase.list_load_options()
+        ).order_by(SeparationCase.created_at.desc()).limit(5).all()
+        
+        closed = cases_by_status.get(CaseStatus.COMPLETED, 0) + cases_by_status.get(CaseStatus.CANCELLED, 0)
+        return {
+            'total_cases': sum(cases_by_status.values()),
+            'active_cases': sum(cases_by_status.values()) - closed,
+            'completed_cases': cases_by_status.get(CaseStatus.COMPLETED, 0),
+            'cases_by_status': cases_by_status,
+            'pending_signoffs': signoffs_by_status.get(SignOffStatus.PENDING, 0),
+            'recent_cases': [case.to_dict() for case in recent_cases]
+        }
+    
+    @staticmethod
+    def pending_signoffs_for(user_id):
+        return SignOff.query.filter_by(assigned_to=user_id, status=SignOffStatus.PENDING).count()
@@ -1,83 +1,249 @@
 """
 Email Service for sending notifications
 """
-from flask import current_app, render_template_string
+from datetime import datetime, timedelta
+from flask import current_app
 from flask_mail import Message
 from app import mail, db
-from app.models import EmailLog
+from app.models import EmailLog, EmailOutbox
 
 
 class EmailService:
-    """Service for sending email notifications"""
+    """Service for sending email notifications.
+    
+    Notifications are queued in ``email_outbox`` as part of the caller's
+    transaction and delivered by ``flask run-mail-worker``, which records the
+    outcome in ``email_logs`` in bulk.
+    """
+    
+    @staticmethod
+    def render(template_name, **context):
+        """Render a notification with the templates compiled at startup"""
+        return current_app.extensions['email_templates'].render(template_name, **context)
+    
+    @staticmethod
+    def send_email(to_email, to_name, subject, body, separation_case_id=None, template_name=None,
+                   summary=None, link=None):
+        """Queue an email; it is committed with the caller's change.
+        
+        ``summary`` and ``link`` describe the email as one line of a digest
+        when ``MAIL_DIGEST_WINDOW`` is set.
+        """
+        outbox = EmailOutbox(
+            separation_case_id=separation_case_id,
+            recipient_email=to_email,
+            recipient_name=to_name,
+            subject=subject,
+            template_name=template_name,
+            body=body,
+            summary=summary or subject,
+            link=link
+        )
+        window = current_app.config['MAIL_DIGEST_WINDOW']
+        if window > 0:
+            # Join the recipient's open digest window, or open one
+            now = datetime.utcnow()
+            outbox.next_attempt_at = db.session.query(db.func.min(EmailOutbox.next_attempt_at)).filter(
+                EmailOutbox.recipient_email == to_email,
+                EmailOutbox.status == 'pending',
+                EmailOutbox.attempts == 0,
+                EmailOutbox.next_attempt_at.between(now, now + timedelta(seconds=window))
+            ).scalar() or now + timedelta(seconds=window)
+        db.session.add(outbox)
+        return True
     
     @staticmethod
-    def send_email(to_email, to_name, subject, body, separation_case_id=None, template_name=None):
-        """Send an email and log it"""
+    def deliver_pending(batch_size=50):
+        """Send one batch of due outbox emails over a single SMTP connection.
+        
+        Returns the number of emails claimed. Claimed rows are leased for
+        ``MAIL_OUTBOX_LEASE`` seconds, so several workers can run side by side
+        and a crashed worker's batch is picked up again once the lease expires.
+        """
+        config = current_app.config
+        now = datetime.utcnow()
+        due = db.select(EmailOutbox.id).where(
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size)
+        lease = now + timedelta(seconds=config['MAIL_OUTBOX_LEASE'])
+        claimed = db.session.execute(db.update(EmailOutbox).where(
+            EmailOutbox.id.in_(due.scalar_subquery()),
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).values(next_attempt_at=lease).returning(EmailOutbox.id, EmailOutbox.recipient_email)).all()
+        if claimed and config['MAIL_DIGEST_WINDOW'] > 0:
+            # Keep each recipient's digest whole when the batch limit split it
+            claimed += db.session.execute(db.update(EmailOutbox).where(
+                EmailOutbox.recipient_email.in_({recipient for _, recipient in claimed}),
+                EmailOutbox.status == 'pending',
+                EmailOutbox.next_attempt_at <= now
+            ).values(next_attempt_at=lease).returning(EmailOutbox.id, EmailOutbox.recipient_email)).all()
+        db.session.commit()
+        if not claimed:
+            return 0
+        
+        rows = EmailOutbox.query.filter(
+            EmailOutbox.id.in_([outbox_id for outbox_id, _ in claimed])
+        ).order_by(EmailOutbox.id).all()
+        remaining = EmailService._compose(rows)
+        connected = False
         try:
-            msg = Message(
-                subject=subject,
-                recipients=[to_email],
-                html=body
-            )
-            
-            # Send email
-            mail.send(msg)
-            
-            # Log email
-            log = EmailLog(
-                separation_case_id=separation_case_id,
-                recipient_email=to_email,
-                recipient_name=to_name,
-                subject=subject,
-                template_name=template_name,
-                status='sent'
-            )
-            db.session.add(log)
-            db.session.commit()
-            
-            return True
-            
+            with mail.connect() as connection:
+                connected = True
+                while remaining:
+                    group, message = remaining[0]
+                    connection.send(message)
+                    remaining.pop(0)
+                    EmailService._record_sent(group, message)
         except Exception as e:
             current_app.logger.error(f"Failed to send email: {str(e)}")
-            
-            # Log failed email
-            log = EmailLog(
-                separation_case_id=separation_case_id,
-                recipient_email=to_email,
-                recipient_name=to_name,
-                subject=subject,
-                template_name=template_name,
-                status='failed',
-                error_message=str(e)
-            )
-            db.session.add(log)
-            db.session.commit()
-            
-            return False
+            # Without a connection every email failed; otherwise only the one being
+            # sent did and the rest of the batch is retried right away
+            failed = remaining if not connected else remaining[:1]
+            for group, _ in failed:
+                for outbox in group:
+                    EmailService._record_failure(outbox, e)
+            for group, _ in remaining[len(failed):]:
+                for outbox in group:
+                    outbox.next_attempt_at = now
+        
+        db.session.commit()
+        return len(claimed)
+    
+    @staticmethod
+    def _compose(rows):
+        """Pair outbox rows with the message that delivers them.
+        
+        In digest mode several rows for one recipient become a single digest
+        message; otherwise each row is its own message.
+        """
+        if current_app.config['MAIL_DIGEST_WINDOW'] <= 0:
+            groups = [[outbox] for outbox in rows]
+        else:
+            by_recipient = {}
+            for outbox in rows:
+                by_recipient.setdefault(outbox.recipient_email, []).append(outbox)
+            groups = list(by_recipient.values())
+        
+        messages = []
+        for group in groups:
+            first = group[0]
+            if len(group) == 1:
+                subject, body = first.subject, first.body
+            else:
+                subject = f"{len(group)} updates on separation cases"
+                body = EmailService.render('digest', recipient_name=first.recipient_name, items=group)
+            messages.append((group, Message(subject=subject, recipients=[first.recipient_email], html=body)))
+        return messages
+    
+    @staticmethod
+    def _record_sent(group, message):
+        """Mark a delivered message's rows sent; a digest is kept as one row for the log"""
+        first = group[0]
+        first.status = 'sent'
+        first.last_error = None
+        first.completed_at = datetime.utcnow()
+        if len(group) > 1:
+            case_ids = {outbox.separation_case_id for outbox in group}
+            first.separation_case_id = case_ids.pop() if len(case_ids) == 1 else None
+            first.subject = message.subject
+            first.body = message.html
+            first.template_name = 'digest'
+            for outbox in group[1:]:
+                db.session.delete(outbox)
+    
+    @staticmethod
+    def _record_failure(outbox, error):
+        """Schedule a retry with exponential backoff, or give up after ``MAIL_OUTBOX_MAX_ATTEMPTS``"""
+        config = current_app.config
+        outbox.attempts += 1
+        outbox.last_error = str(error)
+        if outbox.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+            outbox.status = 'failed'
+            outbox.completed_at = datetime.utcnow()
+        else:
+            delay = min(config['MAIL_OUTBOX_RETRY_DELAY'] * 2 ** (outbox.attempts - 1), 3600)
+            outbox.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    
+    @staticmethod
+    def flush_logs():
+        """Move finished outbox rows into ``email_logs`` in one transaction of its own.
+        
+        Logs are written with INSERT ... SELECT, so nothing is lost if a worker
+        stops between delivering and flushing. Returns the number of rows moved.
+        """
+        columns = ('separation_case_id', 'recipient_email', 'recipient_name', 'subject', 'template_name', 'status')
+        with db.engine.begin() as connection:
+            finished = connection.execute(db.select(EmailOutbox.id).where(
+                EmailOutbox.status.in_(('sent', 'failed'))
+            ).with_for_update(skip_locked=True)).scalars().all()
+            for offset in range(0, len(finished), 500):
+                ids = finished[offset:offset + 500]
+                connection.execute(db.insert(EmailLog).from_select(
+                    [*columns, 'error_message', 'sent_at'],
+                    db.select(
+                        *[getattr(EmailOutbox, column) for column in columns],
+                        EmailOutbox.last_error, EmailOutbox.completed_at
+                    ).where(EmailOutbox.id.in_(ids))
+                ))
+                connection.execute(db.delete(EmailOutbox).where(EmailOutbox.id.in_(ids)))
+        return len(finished)
+    
+    @staticmethod
+    def delivery_stats(start, end):
+        """Sent and failed counts with success and failure rates per template, for emails finished between the dates"""
+        stats = {}
+        since = datetime.combine(start, datetime.min.time())
+        until = datetime.combine(end + timedelta(days=1), datetime.min.time())
+        
+        def template(name):
+            return stats.setdefault(name, {'template_name': name, 'sent': 0, 'failed': 0})
+        
+        logged = db.session.query(
+            EmailLog.template_name, EmailLog.status, db.func.count(EmailLog.id)
+        ).filter(
+            EmailLog.sent_at >= since,
+            EmailLog.sent_at < until
+        ).group_by(EmailLog.template_name, EmailLog.status)
+        for name, status, count in logged:
+            if status in ('sent', 'failed'):
+                template(name)[status] += count
+        
+        # Outcomes not yet flushed to email_logs
+        outbox = db.session.query(
+            EmailOutbox.template_name, EmailOutbox.status, db.func.count(EmailOutbox.id)
+        ).filter(
+            EmailOutbox.status.in_(('sent', 'failed')),
+            EmailOutbox.completed_at >= since,
+            EmailOutbox.completed_at < until
+        ).group_by(EmailOutbox.template_name, EmailOutbox.status)
+        for name, status, count in outbox:
+            template(name)[status] += count
+        
+        for row in stats.values():
+            delivered = row['sent'] + row['failed']
+            row['success_rate'] = round(row['sent'] / delivered, 4) if delivered else None
+            row['failure_rate'] = round(row['failed'] / delivered, 4) if delivered else None
+        return sorted(stats.values(), key=lambda row: row['template_name'] or '')
+    
+    @staticmethod
+    def backlog():
+        """Emails waiting in the outbox right now per template, whenever they were queued"""
+        pending = db.session.query(
+            EmailOutbox.template_name, db.func.count(EmailOutbox.id)
+        ).filter(EmailOutbox.status == 'pending').group_by(EmailOutbox.template_name)
+        return [{'template_name': name, 'queued': count}
+                for name, count in sorted(pending, key=lambda row: row[0] or '')]
     
     @staticmethod
     def send_case_created_notification(case):
         """Send notification when a new separation case is created"""
         subject = f"New Separation Case Created - {case.case_number}"
         
-        body = render_template_string("""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2563eb;">New Separation Case Created</h2>
-                <p>A new separation case has been initiated:</p>
-                <div style="background-color: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>Case Number:</strong> {{ case.case_number }}</p>
-                    <p><strong>Employee:</strong> {{ case.employee.full_name }}</p>
-                    <p><strong>Resignation Date:</strong> {{ case.resignation_date }}</p>
-                    <p><strong>Last Working Day:</strong> {{ case.last_working_day }}</p>
-                </div>
-                <p>Please log in to the system to view the case details and complete your checklist.</p>
-                <a href="{{ url }}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; margin-top: 10px;">View Case</a>
-            </div>
-        </body>
-        </html>
-        """, case=case, url=f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}")
+        url = f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}"
+        body = EmailService.render('case_created', case=case, url=url)
+        summary = f"New separation case {case.case_number} for {case.employee.full_name}"
         
         # Send to employee
         EmailService.send_email(
@@ -86,7 +252,9 @@ class EmailService:
             subject=subject,
             body=body,
             separation_case_id=case.id,
-            template_name='case_created'
+            template_name='case_created',
+            summary=summary,
+            link=url
         )
         
         # Send to direct manager if assigned
@@ -97,7 +265,9 @@ class EmailService:
                 subject=subject,
                 body=body,
                 separation_case_id=case.id,
-                template_name='case_created_manager'
+                template_name='case_created_manager',
+                summary=summary,
+                link=url
             )
     
     @staticmethod
@@ -108,24 +278,8 @@ class EmailService:
         
         subject = f"Checklist Submitted - {case.case_number}"
         
-        body = render_template_string("""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2563eb;">Checklist Submitted for Review</h2>
-                <p>Dear {{ manager.first_name }},</p>
-                <p>The separation checklist has been submitted for your review:</p>
-                <div style="background-color: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>Case Number:</strong> {{ case.case_number }}</p>
-                    <p><strong>Employee:</strong> {{ case.employee.full_name }}</p>
-                    <p><strong>Submitted At:</strong> {{ case.checklist_submitted_at }}</p>
-                </div>
-                <p>Please review the checklist and proceed with the sign-off process.</p>
-                <a href="{{ url }}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; margin-top: 10px;">Review Checklist</a>
-            </div>
-        </body>
-        </html>
-        """, case=case, manager=case.direct_manager, url=f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}")
+        url = f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}"
+        body = EmailService.render('checklist_submitted', case=case, manager=case.direct_manager, url=url)
         
         EmailService.send_email(
             to_email=case.direct_manager.email,
@@ -133,7 +287,9 @@ class EmailService:
             subject=subject,
             body=body,
             separation_case_id=case.id,
-            template_name='checklist_submitted'
+            template_name='checklist_submitted',
+            summary=f"Checklist submitted for {case.case_number} ({case.employee.full_name})",
+            link=url
         )
     
     @staticmethod
@@ -142,25 +298,8 @@ class EmailService:
         case = signoff.separation_case
         subject = f"Sign-off Assignment - {case.case_number}"
         
-        body = render_template_string("""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2563eb;">Sign-off Assignment</h2>
-                <p>Dear {{ assignee.first_name }},</p>
-                <p>You have been assigned to review and sign off on a separation case:</p>
-                <div style="background-color: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>Case Number:</strong> {{ case.case_number }}</p>
-                    <p><strong>Employee:</strong> {{ case.employee.full_name }}</p>
-                    <p><strong>Department:</strong> {{ signoff.department.name }}</p>
-                    <p><strong>Last Working Day:</strong> {{ case.last_working_day }}</p>
-                </div>
-                <p>Please review the case and complete your department sign-off.</p>
-                <a href="{{ url }}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; margin-top: 10px;">Process Sign-off</a>
-            </div>
-        </body>
-        </html>
-        """, case=case, signoff=signoff, assignee=signoff.assignee, url=f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/signoffs/{signoff.id}")
+        url = f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/signoffs/{signoff.id}"
+        body = EmailService.render('signoff_assigned', case=case, signoff=signoff, assignee=signoff.assignee, url=url)
         
         EmailService.send_email(
             to_email=signoff.assignee.email,
@@ -168,7 +307,9 @@ class EmailService:
             subject=subject,
             body=body,
             separation_case_id=case.id,
-            template_name='signoff_assigned'
+            template_name='signoff_assigned',
+            summary=f"{signoff.department.name} sign-off assigned for {case.case_number} ({case.employee.full_name})",
+            link=url
         )
     
     @staticmethod
@@ -178,27 +319,8 @@ class EmailService:
         status_text = 'approved' if signoff.status == 'approved' else 'rejected'
         subject = f"Sign-off {status_text.title()} - {case.case_number}"
         
-        body = render_template_string("""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: {{ '#22c55e' if signoff.status == 'approved' else '#ef4444' }};">
-                    Sign-off {{ signoff.status.title() }}
-                </h2>
-                <p>A sign-off has been processed for separation case {{ case.case_number }}:</p>
-                <div style="background-color: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>Department:</strong> {{ signoff.department.name }}</p>
-                    <p><strong>Status:</strong> {{ signoff.status.title() }}</p>
-                    <p><strong>Processed By:</strong> {{ signoff.assignee.full_name }}</p>
-                    {% if signoff.comments %}
-                    <p><strong>Comments:</strong> {{ signoff.comments }}</p>
-                    {% endif %}
-                </div>
-                <a href="{{ url }}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; margin-top: 10px;">View Case</a>
-            </div>
-        </body>
-        </html>
-        """, case=case, signoff=signoff, url=f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}")
+        url = f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}"
+        body = EmailService.render('signoff_processed', case=case, signoff=signoff, url=url)
         
         # Send to employee
         EmailService.send_email(
@@ -207,7 +329,9 @@ class EmailService:
             subject=subject,
             body=body,
             separation_case_id=case.id,
-            template_name='signoff_processed'
+            template_name='signoff_processed',
+            summary=f"{signoff.department.name} sign-off {status_text} for {case.case_number}",
+            link=url
         )
     
     @staticmethod
@@ -215,24 +339,8 @@ class EmailService:
         """Send notification when separation is completed"""
         subject = f"Separation Process Completed - {case.case_number}"
         
-        body = render_template_string("""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #22c55e;">Separation Process Completed</h2>
-                <p>Dear {{ case.employee.first_name }},</p>
-                <p>Your separation process has been successfully completed.</p>
-                <div style="background-color: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <p><strong>Case Number:</strong> {{ case.case_number }}</p>
-                    <p><strong>Last Working Day:</strong> {{ case.last_working_day }}</p>
-                    <p><strong>Completed At:</strong> {{ case.completed_at }}</p>
-                </div>
-                <p>All required sign-offs have been obtained and your exit process is now complete.</p>
-                <p>We wish you all the best in your future endeavors.</p>
-            </div>
-        </body>
-        </html>
-        """, case=case, url=f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}")
+        url = f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/cases/{case.id}"
+        body = EmailService.render('separation_completed', case=case, url=url)
         
         EmailService.send_email(
             to_email=case.employee.email,
@@ -240,5 +348,7 @@ class EmailService:
             subject=subject,
             body=body,
             separation_case_id=case.id,
-            template_name='separation_completed'
+            template_name='separation_completed',
+            summary=f"Separation {case.case_number} completed",
+            link=url
         )
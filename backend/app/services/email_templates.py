@@ -0,0 +1,38 @@
+"""
+Precompiled email template registry
+"""
+import os
+
+
+DEFAULT_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+
+
+class EmailTemplateRegistry:
+    """
+    Notification templates compiled once when the app starts.
+    
+    Each template is read from ``EMAIL_TEMPLATES_DIR`` when that directory has
+    a file of the same name, otherwise from ``app/templates/email``.
+    """
+    
+    NAMES = ('case_created', 'checklist_submitted', 'signoff_assigned', 'signoff_processed',
+             'separation_completed', 'digest')
+    
+    def __init__(self, jinja_env, override_dir=None):
+        self.templates = {}
+        for name in self.NAMES:
+            path = os.path.join(DEFAULT_TEMPLATES_DIR, f'{name}.html')
+            if override_dir and os.path.isfile(os.path.join(override_dir, f'{name}.html')):
+                path = os.path.join(override_dir, f'{name}.html')
+            with open(path, encoding='utf-8') as source:
+                # from_string on the Flask environment autoescapes like render_template_string
+                self.templates[name] = jinja_env.from_string(source.read())
+    
+    @staticmethod
+    def init_app(app):
+        app.extensions['email_templates'] = EmailTemplateRegistry(
+            app.jinja_env, app.config.get('EMAIL_TEMPLATES_DIR')
+        )
+    
+    def render(self, name, **context):
+        return self.templates[name].render(**context)
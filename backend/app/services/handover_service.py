@@ -0,0 +1,191 @@
+"""
+Handover schedule attendees, booking conflicts and free time
+"""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import HandoverSchedule, HandoverAttendee, ResponseStatus
+
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+SLOT_ALIGNMENT = 15  # minutes; free time left today starts at the next quarter hour
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _clock(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class HandoverService:
+    """
+    Keeps ``handover_attendees`` in step with each schedule's time, organizer and
+    ``attendees``.
+    
+    Every participant has one row per schedule carrying the schedule's date
+    and times, so "my meetings this week" and "who is already booked at this
+    time" are indexed range scans per user instead of a scan of every
+    schedule's JSON attendee list. Declined meetings do not count as booked.
+    Changes are written in the caller's transaction.
+    """
+    
+    @staticmethod
+    def participants(organizer_id, attendees):
+        """Organizer plus attendee user IDs, ignoring entries that are not IDs"""
+        user_ids = {organizer_id}
+        for attendee in attendees or []:
+            try:
+                user_ids.add(int(attendee))
+            except (TypeError, ValueError):
+                continue
+        return user_ids
+    
+    @staticmethod
+    def sync_attendees(schedule):
+        """Update a flushed schedule's attendee rows to its current time and participants.
+        
+        Participants who stay keep their response; new ones start at
+        ``needs_action``, except the organizer, who has accepted.
+        """
+        existing = {attendance.user_id: attendance for attendance in schedule.attendances}
+        for user_id in HandoverService.participants(schedule.organizer_id, schedule.attendees):
+            attendance = existing.pop(user_id, None)
+            if attendance is None:
+                attendance = HandoverAttendee(user_id=user_id, response_status=(
+                    ResponseStatus.ACCEPTED if user_id == schedule.organizer_id else ResponseStatus.NEEDS_ACTION
+                ))
+                schedule.attendances.append(attendance)
+            attendance.scheduled_date = schedule.scheduled_date
+            attendance.start_time = schedule.start_time
+            attendance.end_time = schedule.end_time
+        for attendance in existing.values():
+            schedule.attendances.remove(attendance)
+    
+    @staticmethod
+    def find_conflicts(user_ids, scheduled_date, start_time, end_time, exclude_schedule_id=None):
+        """Schedules that book any of ``user_ids`` in an overlapping time on ``scheduled_date``.
+        
+        Meetings that only touch, one ending as the other starts, do not
+        conflict. Returns one dict per (user, schedule) pair in start order.
+        """
+        query = db.session.query(
+            HandoverAttendee.user_id, HandoverAttendee.schedule_id,
+            HandoverAttendee.start_time, HandoverAttendee.end_time, HandoverSchedule.title, HandoverSchedule.separation_case_id
+        ).join(HandoverSchedule, HandoverSchedule.id == HandoverAttendee.schedule_id).filter(
+            HandoverAttendee.user_id.in_(list(user_ids)),
+            HandoverAttendee.scheduled_date == scheduled_date,
+            HandoverAttendee.start_time < end_time,
+            HandoverAttendee.end_time > start_time,
+            HandoverAttendee.response_status != ResponseStatus.DECLINED
+        )
+        if exclude_schedule_id is not None:
+            query = query.filter(HandoverAttendee.schedule_id != exclude_schedule_id)
+        
+        return [{
+            'user_id': user_id,
+            'schedule_id': schedule_id,
+            'separation_case_id': case_id,
+            'title': title,
+            'scheduled_date': scheduled_date.isoformat(),
+            'start_time': start.strftime('%H:%M'),
+            'end_time': end.strftime('%H:%M'),
+        } for user_id, schedule_id, start, end, title, case_id in sorted(
+            query.all(), key=lambda row: (row.start_time, row.schedule_id, row.user_id)
+        )]
+    
+    @staticmethod
+    def free_slots(user_ids, start_date, end_date, duration, limit=10):
+        """Earliest bookable slots of ``duration`` minutes when all of ``user_ids`` are free.
+        
+        Slots fall within the configured working hours on working days from
+        ``start_date`` to ``end_date`` inclusive, never before the current time
+        in ``HANDOVER_TIMEZONE``. Each free gap is split into back-to-back
+        slots of exactly ``duration`` minutes. Bookings come from one range
+        scan of ``handover_attendees`` ordered by start, merged day by day.
+        Returns ``{'scheduled_date', 'start_time', 'end_time'}`` dicts.
+        """
+        day_start, day_end, workdays = HandoverService.working_hours()
+        now = datetime.now(ZoneInfo(current_app.config['HANDOVER_TIMEZONE']))
+        next_start = (_minutes(now) // SLOT_ALIGNMENT + 1) * SLOT_ALIGNMENT
+        booked = {}
+        for scheduled_date, start_time, end_time in db.session.query(
+            HandoverAttendee.scheduled_date, HandoverAttendee.start_time, HandoverAttendee.end_time
+        ).filter(
+            HandoverAttendee.user_id.in_(list(user_ids)),
+            HandoverAttendee.scheduled_date.between(start_date, end_date),
+            HandoverAttendee.response_status != ResponseStatus.DECLINED
+        ).order_by(HandoverAttendee.scheduled_date, HandoverAttendee.start_time):
+            booked.setdefault(scheduled_date, []).append((_minutes(start_time), _minutes(end_time)))
+        
+        slots = []
+        day = max(start_date, now.date())
+        while day <= end_date and len(slots) < limit:
+            if day.weekday() in workdays:
+                # Bookings arrive sorted by start, so each gap ends where the next booking begins
+                free_from = max(day_start, next_start) if day == now.date() else day_start
+                for start, end in booked.get(day, []) + [(day_end, day_end)]:
+                    while min(start, day_end) - free_from >= duration and len(slots) < limit:
+                        slots.append((day, free_from, free_from + duration))
+                        free_from += duration
+                    free_from = max(free_from, end)
+            day += timedelta(days=1)
+        
+        return [{
+            'scheduled_date': day.isoformat(),
+            'start_time': _clock(start),
+            'end_time': _clock(end),
+        } for day, start, end in slots[:limit]]
+    
+    @staticmethod
+    def working_hours():
+        """``(start minute, end minute, weekday numbers)`` from the working hours configuration"""
+        start, end = current_app.config['HANDOVER_WORKING_HOURS'].split('-')
+        workdays = {WEEKDAYS.index(day.strip().lower()[:3])
+                    for day in current_app.config['HANDOVER_WORKING_DAYS'].split(',')}
+        return (_minutes(datetime.strptime(start.strip(), '%H:%M').time()),
+                _minutes(datetime.strptime(end.strip(), '%H:%M').time()), workdays)
+    
+    @staticmethod
+    def attending(user_id, start_date, end_date):
+        """``(schedule, response_status)`` for each handover of ``user_id`` between the dates, in start order"""
+        return db.session.query(HandoverSchedule, HandoverAttendee.response_status).join(
+            HandoverAttendee, HandoverAttendee.schedule_id == HandoverSchedule.id
+        ).filter(
+            HandoverAttendee.user_id == user_id,
+            HandoverAttendee.scheduled_date.between(start_date, end_date)
+        ).options(selectinload(HandoverSchedule.organizer)).order_by(
+            HandoverAttendee.scheduled_date, HandoverAttendee.start_time, HandoverSchedule.id
+        ).all()
+    
+    @staticmethod
+    def rebuild():
+        """Recompute every attendee row from the schedules' organizer and ``attendees``.
+        
+        Responses already recorded for a schedule and user are kept.
+        """
+        responses = {
+            (schedule_id, user_id): response_status for schedule_id, user_id, response_status in
+            db.session.query(HandoverAttendee.schedule_id, HandoverAttendee.user_id, HandoverAttendee.response_status)
+        }
+        rows = []
+        for schedule_id, organizer_id, attendees, scheduled_date, start_time, end_time in db.session.query(
+            HandoverSchedule.id, HandoverSchedule.organizer_id, HandoverSchedule.attendees,
+            HandoverSchedule.scheduled_date, HandoverSchedule.start_time, HandoverSchedule.end_time
+        ).yield_per(5000):
+            rows.extend({
+                'schedule_id': schedule_id, 'user_id': user_id, 'scheduled_date': scheduled_date,
+                'start_time': start_time, 'end_time': end_time,
+                'response_status': responses.get((schedule_id, user_id), (
+                    ResponseStatus.ACCEPTED if user_id == organizer_id else ResponseStatus.NEEDS_ACTION
+                ))
+            } for user_id in HandoverService.participants(organizer_id, attendees))
+        
+        db.session.execute(db.delete(HandoverAttendee))
+        for offset in range(0, len(rows), 5000):
+            db.session.execute(db.insert(HandoverAttendee), rows[offset:offset + 5000])
+        db.session.commit()
+        return len(rows)
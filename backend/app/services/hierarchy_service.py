@@ -0,0 +1,151 @@
+"""
+Management chain closure table maintenance and queries
+"""
+from app import db
+from app.models import User, UserHierarchy
+
+
+class HierarchyCycleError(ValueError):
+    """Raised when a manager assignment would make a user report to themselves"""
+
+
+class HierarchyService:
+    """
+    Keeps ``user_hierarchy`` in step with ``User.manager_id``.
+    
+    Every user has a depth-0 row for themselves plus one row per manager above
+    them, so reporting-line checks and subtree filters are single indexed lookups.
+    Changes are written in the caller's transaction.
+    """
+    
+    @staticmethod
+    def add_user(user):
+        """Insert closure rows for a newly flushed user under ``user.manager_id``"""
+        db.session.add(UserHierarchy(ancestor_id=user.id, descendant_id=user.id, depth=0))
+        if user.manager_id:
+            db.session.execute(db.insert(UserHierarchy).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                db.select(
+                    UserHierarchy.ancestor_id, db.literal(user.id), UserHierarchy.depth + 1
+                ).where(UserHierarchy.descendant_id == user.manager_id)
+            ))
+    
+    @staticmethod
+    def add_users(managers):
+        """Insert closure rows for newly inserted users, given ``{user_id: manager_id}``.
+        
+        Managers may be other users in ``managers`` or existing users. The new
+        users must not have reports outside ``managers`` and their manager
+        links must not form a cycle.
+        """
+        existing = list({m for m in managers.values() if m is not None and m not in managers})
+        chains = {}
+        for offset in range(0, len(existing), 500):
+            for ancestor_id, descendant_id, depth in db.session.query(
+                UserHierarchy.ancestor_id, UserHierarchy.descendant_id, UserHierarchy.depth
+            ).filter(UserHierarchy.descendant_id.in_(existing[offset:offset + 500])):
+                chains.setdefault(descendant_id, []).append((ancestor_id, depth))
+        
+        # Ancestors of each new user as (ancestor_id, depth), resolved top-down
+        ancestors = {}
+        for start_id in managers:
+            pending, user_id = [], start_id
+            while user_id in managers and user_id not in ancestors:
+                pending.append(user_id)
+                user_id = managers[user_id]
+            for user_id in reversed(pending):
+                manager_id = managers[user_id]
+                if manager_id is None:
+                    above = []
+                elif manager_id in managers:
+                    above = [(manager_id, 0)] + ancestors[manager_id]
+                else:
+                    above = chains.get(manager_id, [(manager_id, 0)])
+                ancestors[user_id] = [(ancestor_id, depth + 1) for ancestor_id, depth in above]
+        
+        rows = []
+        for user_id, above in ancestors.items():
+            rows.append({'ancestor_id': user_id, 'descendant_id': user_id, 'depth': 0})
+            rows.extend({'ancestor_id': a, 'descendant_id': user_id, 'depth': d} for a, d in above)
+        for offset in range(0, len(rows), 5000):
+            db.session.execute(db.insert(UserHierarchy), rows[offset:offset + 5000])
+        return len(rows)
+    
+    @staticmethod
+    def set_manager(user, manager_id):
+        """Move ``user`` and everyone under them beneath ``manager_id``.
+        
+        Raises HierarchyCycleError if ``manager_id`` is the user or one of their reports.
+        """
+        if manager_id == user.manager_id:
+            return
+        if manager_id and HierarchyService.is_in_reporting_line(user.id, manager_id):
+            raise HierarchyCycleError('Manager assignment would create a reporting cycle')
+        
+        subtree = db.select(UserHierarchy.descendant_id).where(
+            UserHierarchy.ancestor_id == user.id
+        ).scalar_subquery()
+        old_ancestors = db.select(UserHierarchy.ancestor_id).where(
+            UserHierarchy.descendant_id == user.id,
+            UserHierarchy.ancestor_id != user.id
+        ).scalar_subquery()
+        
+        # Detach the subtree from its old management chain
+        db.session.execute(db.delete(UserHierarchy).where(
+            UserHierarchy.descendant_id.in_(subtree),
+            UserHierarchy.ancestor_id.in_(old_ancestors)
+        ).execution_options(synchronize_session=False))
+        
+        # Attach it below every ancestor of the new manager
+        if manager_id:
+            above = db.aliased(UserHierarchy)
+            below = db.aliased(UserHierarchy)
+            db.session.execute(db.insert(UserHierarchy).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                # Every ancestor of the manager pairs with every member of the subtree
+                db.select(
+                    above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+                ).select_from(above).join(below, db.true()).where(
+                    above.descendant_id == manager_id,
+                    below.ancestor_id == user.id
+                )
+            ))
+        
+        user.manager_id = manager_id
+    
+    @staticmethod
+    def is_in_reporting_line(manager_id, user_id):
+        """True if ``user_id`` is ``manager_id`` or reports to them directly or indirectly"""
+        return db.session.query(UserHierarchy.depth).filter_by(
+            ancestor_id=manager_id,
+            descendant_id=user_id
+        ).first() is not None
+    
+    @staticmethod
+    def subtree_ids(manager_id, include_self=False):
+        """Subquery of user ids under ``manager_id``, for use with ``in_()``"""
+        query = db.select(UserHierarchy.descendant_id).where(UserHierarchy.ancestor_id == manager_id)
+        if not include_self:
+            query = query.where(UserHierarchy.depth > 0)
+        return query
+    
+    @staticmethod
+    def rebuild():
+        """Recompute the whole closure table from ``users.manager_id``"""
+        managers = dict(db.session.query(User.id, User.manager_id).all())
+        
+        rows = []
+        for user_id in managers:
+            rows.append({'ancestor_id': user_id, 'descendant_id': user_id, 'depth': 0})
+            seen = {user_id}
+            ancestor_id, depth = managers.get(user_id), 1
+            while ancestor_id is not None and ancestor_id not in seen:
+                rows.append({'ancestor_id': ancestor_id, 'descendant_id': user_id, 'depth': depth})
+                seen.add(ancestor_id)
+                ancestor_id, depth = managers.get(ancestor_id), depth + 1
+        
+        db.session.execute(db.delete(UserHierarchy))
+        for offset in range(0, len(rows), 5000):
+            db.session.execute(db.insert(UserHierarchy), rows[offset:offset + 5000])
+        db.session.commit()
+        return len(rows)
@@ -0,0 +1,223 @@
+"""
+Reporting rollups maintained from case and sign-off transitions
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from app import db
+from app.dialects import upsert_insert
+from app.models import (
+    SeparationCase, SignOff, User, ReportDailyDepartment, ReportCompletionDays,
+    CaseStatus, SignOffStatus
+)
+
+
+ROLLUP_METRICS = [
+    'cases_opened', 'cases_completed', 'cases_cancelled',
+    'completion_days_total', 'signoffs_completed', 'signoff_hours_total'
+]
+
+
+class ReportingService:
+    """
+    Keeps daily per-department rollups so reports never scan the fact tables.
+    
+    Case counts are attributed to the employee's department, sign-off turnaround
+    to the signing department. Days-to-complete are kept as an exact histogram so
+    percentiles can be merged over any date range. The ``record_*`` methods write
+    in the caller's transaction; re-opened cases are only corrected by ``rebuild()``.
+    """
+    
+    # ==================== INCREMENTAL UPDATES ====================
+    
+    @staticmethod
+    def record_case_opened(case, employee):
+        ReportingService._increment(case.created_at.date(), employee.department_id, cases_opened=1)
+    
+    @staticmethod
+    def record_case_status_change(case, old_status):
+        """Count a case entering the completed or cancelled state"""
+        if case.status == old_status:
+            return
+        department_id = case.employee.department_id
+        if case.status == CaseStatus.COMPLETED:
+            completed_on = (case.completed_at or datetime.utcnow()).date()
+            days = (completed_on - case.resignation_date).days
+            ReportingService._increment(completed_on, department_id, cases_completed=1, completion_days_total=days)
+            ReportingService._increment_histogram(completed_on, department_id, days)
+        elif case.status == CaseStatus.CANCELLED:
+            ReportingService._increment(datetime.utcnow().date(), department_id, cases_cancelled=1)
+    
+    @staticmethod
+    def record_signoff_completed(signoff, old_status):
+        """Count a sign-off leaving the pending state"""
+        if old_status != SignOffStatus.PENDING or signoff.status == SignOffStatus.PENDING:
+            return
+        hours = (signoff.completed_at - signoff.assigned_at).total_seconds() / 3600
+        ReportingService._increment(
+            signoff.completed_at.date(), signoff.department_id, signoffs_completed=1, signoff_hours_total=hours
+        )
+    
+    @staticmethod
+    def _increment(day, department_id, **increments):
+        stmt = upsert_insert(ReportDailyDepartment).values(
+            day=day, department_id=department_id or 0, **increments
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['day', 'department_id'],
+            set_={name: getattr(ReportDailyDepartment, name) + getattr(stmt.excluded, name) for name in increments}
+        ))
+    
+    @staticmethod
+    def _increment_histogram(day, department_id, days):
+        stmt = upsert_insert(ReportCompletionDays).values(
+            day=day, department_id=department_id or 0, days=days, cases=1
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['day', 'department_id', 'days'],
+            set_={'cases': ReportCompletionDays.cases + 1}
+        ))
+    
+    # ==================== QUERIES ====================
+    
+    @staticmethod
+    def timeseries(start, end, interval='day', department_id=None):
+        """Metrics per day, ISO week or month between ``start`` and ``end`` inclusive"""
+        rollups = db.session.query(
+            ReportDailyDepartment.day,
+            *[db.func.sum(getattr(ReportDailyDepartment, name)) for name in ROLLUP_METRICS]
+        ).filter(ReportDailyDepartment.day.between(start, end))
+        histogram = db.session.query(
+            ReportCompletionDays.day, ReportCompletionDays.days, db.func.sum(ReportCompletionDays.cases)
+        ).filter(ReportCompletionDays.day.between(start, end))
+        if department_id is not None:
+            rollups = rollups.filter(ReportDailyDepartment.department_id == department_id)
+            histogram = histogram.filter(ReportCompletionDays.department_id == department_id)
+        
+        totals = defaultdict(lambda: dict.fromkeys(ROLLUP_METRICS, 0))
+        histograms = defaultdict(lambda: defaultdict(int))
+        for day, *values in rollups.group_by(ReportDailyDepartment.day):
+            period = totals[ReportingService._period(day, interval)]
+            for name, value in zip(ROLLUP_METRICS, values):
+                period[name] += value or 0
+        for day, days, cases in histogram.group_by(ReportCompletionDays.day, ReportCompletionDays.days):
+            histograms[ReportingService._period(day, interval)][days] += cases
+        
+        return [
+            {'period': period.isoformat(), **ReportingService._metrics(totals[period], histograms[period])}
+            for period in sorted(totals)
+        ]
+    
+    @staticmethod
+    def by_department(start, end):
+        """Metrics per department between ``start`` and ``end`` inclusive"""
+        rollups = db.session.query(
+            ReportDailyDepartment.department_id,
+            *[db.func.sum(getattr(ReportDailyDepartment, name)) for name in ROLLUP_METRICS]
+        ).filter(
+            ReportDailyDepartment.day.between(start, end)
+        ).group_by(ReportDailyDepartment.department_id)
+        histogram = db.session.query(
+            ReportCompletionDays.department_id, ReportCompletionDays.days, db.func.sum(ReportCompletionDays.cases)
+        ).filter(
+            ReportCompletionDays.day.between(start, end)
+        ).group_by(ReportCompletionDays.department_id, ReportCompletionDays.days)
+        
+        histograms = defaultdict(dict)
+        for department_id, days, cases in histogram:
+            histograms[department_id][days] = cases
+        
+        results = []
+        for department_id, *values in rollups:
+            totals = {name: value or 0 for name, value in zip(ROLLUP_METRICS, values)}
+            results.append({
+                'department_id': department_id or None,
+                **ReportingService._metrics(totals, histograms[department_id])
+            })
+        return results
+    
+    @staticmethod
+    def _period(day, interval):
+        if interval == 'week':
+            return day - timedelta(days=day.weekday())
+        if interval == 'month':
+            return day.replace(day=1)
+        return day
+    
+    @staticmethod
+    def _metrics(totals, histogram):
+        completed = totals['cases_completed']
+        signoffs = totals['signoffs_completed']
+        return {
+            'cases_opened': totals['cases_opened'],
+            'cases_completed': completed,
+            'cases_cancelled': totals['cases_cancelled'],
+            'mean_days_to_complete': round(totals['completion_days_total'] / completed, 1) if completed else None,
+            'p90_days_to_complete': ReportingService._percentile(histogram, 0.9),
+            'signoffs_completed': signoffs,
+            'mean_signoff_turnaround_hours': round(totals['signoff_hours_total'] / signoffs, 1) if signoffs else None
+        }
+    
+    @staticmethod
+    def _percentile(histogram, fraction):
+        """Nearest-rank percentile of a {value: count} histogram"""
+        total = sum(histogram.values())
+        if not total:
+            return None
+        rank = max(math.ceil(fraction * total), 1)
+        seen = 0
+        for value in sorted(histogram):
+            seen += histogram[value]
+            if seen >= rank:
+                return value
+    
+    # ==================== REBUILD ====================
+    
+    @staticmethod
+    def rebuild():
+        """Recompute every rollup from the case and sign-off tables"""
+        daily = defaultdict(lambda: dict.fromkeys(ROLLUP_METRICS, 0))
+        histogram = defaultdict(int)
+        
+        cases = db.session.query(
+            SeparationCase.status, SeparationCase.created_at, SeparationCase.updated_at,
+            SeparationCase.completed_at, SeparationCase.resignation_date, User.department_id
+        ).join(User, SeparationCase.employee_id == User.id)
+        for status, created_at, updated_at, completed_at, resignation_date, department_id in cases.yield_per(1000):
+            department_id = department_id or 0
+            if created_at:
+                daily[(created_at.date(), department_id)]['cases_opened'] += 1
+            if status == CaseStatus.COMPLETED and completed_at:
+                days = (completed_at.date() - resignation_date).days
+                daily[(completed_at.date(), department_id)]['cases_completed'] += 1
+                daily[(completed_at.date(), department_id)]['completion_days_total'] += days
+                histogram[(completed_at.date(), department_id, days)] += 1
+            elif status == CaseStatus.CANCELLED and updated_at:
+                daily[(updated_at.date(), department_id)]['cases_cancelled'] += 1
+        
+        signoffs = db.session.query(
+            SignOff.department_id, SignOff.assigned_at, SignOff.completed_at
+        ).filter(
+            SignOff.status != SignOffStatus.PENDING,
+            SignOff.completed_at.isnot(None),
+            SignOff.assigned_at.isnot(None)
+        )
+        for department_id, assigned_at, completed_at in signoffs.yield_per(1000):
+            totals = daily[(completed_at.date(), department_id or 0)]
+            totals['signoffs_completed'] += 1
+            totals['signoff_hours_total'] += (completed_at - assigned_at).total_seconds() / 3600
+        
+        db.session.execute(db.delete(ReportDailyDepartment))
+        db.session.execute(db.delete(ReportCompletionDays))
+        if daily:
+            db.session.execute(db.insert(ReportDailyDepartment), [
+                {'day': day, 'department_id': department_id, **totals}
+                for (day, department_id), totals in daily.items()
+            ])
+        if histogram:
+            db.session.execute(db.insert(ReportCompletionDays), [
+                {'day': day, 'department_id': department_id, 'days': days, 'cases': cases}
+                for (day, department_id, days), cases in histogram.items()
+            ])
+        db.session.commit()
+        return len(daily)
@@ -0,0 +1,32 @@
+"""
+Token generation and revocation tracking
+"""
+from app import db
+from app.cache import VersionedCatalog
+from app.models import TokenGeneration
+
+
+def _load_generations():
+    return dict(db.session.query(TokenGeneration.user_id, TokenGeneration.generation).all())
+
+
+class TokenService:
+    """Tracks which users' tokens have been revoked, cached in every worker"""
+    
+    revocations = VersionedCatalog('token_generations', _load_generations)
+    
+    @staticmethod
+    def generation(user_id):
+        """Generation to embed in a newly issued token"""
+        return TokenGeneration.current(user_id)
+    
+    @staticmethod
+    def revoke(user_id):
+        """Revoke a user's existing tokens; call before committing"""
+        TokenGeneration.bump(user_id)
+        TokenService.revocations.bump()
+    
+    @staticmethod
+    def is_revoked(user_id, generation):
+        """True if a token of ``generation`` was issued before the user's last revocation"""
+        return generation < TokenService.revocations.get().get(user_id, 0)
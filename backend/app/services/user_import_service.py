@@ -0,0 +1,240 @@
+"""
+Bulk user import from CSV or JSON Lines
+"""
+import csv
+import json
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import User, UserRole
+from app.passwords import hash_passwords
+from app.services.catalog_service import CatalogService
+from app.services.hierarchy_service import HierarchyService
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return value if value not in ('', None) else None
+
+
+class UserImportService:
+    """
+    Streams user records into ``users`` in batched transactions.
+    
+    Each batch is validated against the file so far and against existing
+    emails and employee ids with one query per column, passwords are hashed in
+    the hashing pool and the batch is inserted with a single executemany.
+    Managers are linked once every row is in, since a manager may appear
+    later in the file than their reports.
+    """
+    
+    FORMATS = ('csv', 'jsonl')
+    BATCH_SIZE = 1000
+    # JSON records can carry any type; these fields must be strings when given
+    TEXT_FIELDS = ('email', 'first_name', 'last_name', 'role', 'department_code', 'manager_email', 'phone', 'password')
+    
+    @staticmethod
+    def read_rows(stream, fmt):
+        """Yield one dict per record of a text stream; unparsable records yield a ValueError"""
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield ValueError('Invalid JSON')
+                continue
+            yield record if isinstance(record, dict) else ValueError('Expected a JSON object')
+    
+    @staticmethod
+    def import_rows(rows, batch_size=None):
+        """Import user records, returning ``{'created', 'failed', 'errors'}``.
+        
+        Records take the ``POST /api/users`` fields, with ``department_code``
+        as an alternative to ``department_id`` and ``manager_email`` in place
+        of ``manager_id``. ``password`` is optional; users imported without
+        one sign in with Google or after an administrator sets a password.
+        """
+        batch_size = batch_size or UserImportService.BATCH_SIZE
+        departments = CatalogService.get_departments()
+        department_codes = {department['code']: department_id for department_id, department in departments.items()}
+        department_ids = set(departments)
+        
+        result = {'created': 0, 'failed': 0, 'errors': []}
+        seen_emails, seen_employee_ids = set(), set()
+        created = {}          # email -> (row number, user id)
+        manager_emails = {}   # email -> manager email
+        
+        def fail(number, email, error):
+            result['failed'] += 1
+            result['errors'].append({'row': number, 'email': email, 'error': error})
+        
+        def flush(batch):
+            emails = [record['email'] for _, record, _ in batch]
+            employee_ids = [record['employee_id'] for _, record, _ in batch if record['employee_id']]
+            taken_emails = {email for email, in db.session.query(User.email).filter(User.email.in_(emails))}
+            taken_employee_ids = {
+                employee_id for employee_id, in
+                db.session.query(User.employee_id).filter(User.employee_id.in_(employee_ids))
+            } if employee_ids else set()
+            
+            accepted = []
+            for number, record, manager_email in batch:
+                if record['email'] in taken_emails:
+                    fail(number, record['email'], 'Email already registered')
+                elif record['employee_id'] in taken_employee_ids:
+                    fail(number, record['email'], 'Employee ID already in use')
+                else:
+                    accepted.append((number, record, manager_email))
+            if not accepted:
+                return
+            
+            passwords = [record.pop('password') for _, record, _ in accepted]
+            to_hash = [password for password in passwords if password]
+            hashes = iter(hash_passwords(to_hash))
+            for (_, record, _), password in zip(accepted, passwords):
+                record['password_hash'] = next(hashes) if password else None
+            
+            try:
+                ids = db.session.scalars(db.insert(User).returning(User.id, sort_by_parameter_order=True),
+                                         [record for _, record, _ in accepted]).all()
+                db.session.commit()
+            except IntegrityError:
+                # Another writer took an email or employee id since the batch was checked
+                db.session.rollback()
+                for number, record, _ in accepted:
+                    fail(number, record['email'], 'Conflicts with a user created during the import')
+                return
+            
+            result['created'] += len(ids)
+            for (number, record, manager_email), user_id in zip(accepted, ids):
+                created[record['email']] = (number, user_id)
+                if manager_email:
+                    manager_emails[record['email']] = manager_email
+        
+        batch = []
+        for number, row in enumerate(rows, start=1):
+            if isinstance(row, Exception):
+                fail(number, None, str(row))
+                continue
+            record, error = UserImportService._validate(row, department_codes, department_ids)
+            email = record.get('email') if record else _clean(row.get('email'))
+            if not error and email in seen_emails:
+                error = 'Duplicate email in import'
+            if not error and record['employee_id'] and record['employee_id'] in seen_employee_ids:
+                error = 'Duplicate employee ID in import'
+            if error:
+                fail(number, email, error)
+                continue
+            
+            seen_emails.add(email)
+            if record['employee_id']:
+                seen_employee_ids.add(record['employee_id'])
+            batch.append((number, record, record.pop('manager_email')))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        
+        UserImportService._link_managers(created, manager_emails, result['errors'])
+        result['errors'].sort(key=lambda error: error['row'])
+        return result
+    
+    @staticmethod
+    def _validate(row, department_codes, department_ids):
+        """Normalize one record into ``users`` column values, or return an error"""
+        row = {key.strip().lower(): _clean(value) for key, value in row.items() if key}
+        for field in ('email', 'first_name', 'last_name'):
+            if not row.get(field):
+                return None, f'{field} is required'
+        for field in UserImportService.TEXT_FIELDS:
+            if row.get(field) is not None and not isinstance(row[field], str):
+                return None, f'{field} must be a string'
+        
+        role = row.get('role') or UserRole.EMPLOYEE
+        if role not in UserRole.all_roles():
+            return None, f'Unknown role: {role}'
+        
+        department_id = row.get('department_id')
+        if row.get('department_code'):
+            department_id = department_codes.get(row['department_code'])
+            if department_id is None:
+                return None, f"Unknown department code: {row['department_code']}"
+        elif department_id is not None:
+            try:
+                department_id = int(department_id)
+            except (TypeError, ValueError):
+                return None, 'department_id must be an integer'
+            if department_id not in department_ids:
+                return None, f'Unknown department: {department_id}'
+        
+        email = row['email'].lower()
+        manager_email = row['manager_email'].lower() if row.get('manager_email') else None
+        if manager_email == email:
+            return None, 'A user cannot be their own manager'
+        
+        return {
+            'email': email,
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'role': role,
+            'department_id': department_id,
+            'employee_id': str(row['employee_id']) if row.get('employee_id') is not None else None,
+            'phone': row.get('phone'),
+            'password': row.get('password'),
+            'manager_email': manager_email,
+        }, None
+    
+    @staticmethod
+    def _link_managers(created, manager_emails, errors):
+        """Resolve ``manager_email`` for imported users and write their closure rows.
+        
+        Users whose manager cannot be linked stay imported without one, with a
+        note in ``errors``.
+        """
+        emails = {user_id: email for email, (_, user_id) in created.items()}
+        
+        def unlinked(user_id, error):
+            errors.append({'row': created[emails[user_id]][0], 'email': emails[user_id], 'error': error})
+        
+        managers = {user_id: None for _, user_id in created.values()}
+        
+        wanted = [email for email in set(manager_emails.values()) if email not in created]
+        existing = {}
+        for offset in range(0, len(wanted), 500):
+            existing.update(db.session.query(User.email, User.id).filter(
+                User.email.in_(wanted[offset:offset + 500])
+            ))
+        
+        for email, manager_email in manager_emails.items():
+            user_id = created[email][1]
+            if manager_email in created:
+                managers[user_id] = created[manager_email][1]
+            elif manager_email in existing:
+                managers[user_id] = existing[manager_email]
+            else:
+                unlinked(user_id, f'Manager {manager_email} not found; imported without a manager')
+        
+        # Only imported users can form a cycle, since existing users cannot report to them
+        checked = set()
+        for start_id in list(managers):
+            path, on_path, user_id = [], set(), start_id
+            while user_id in managers and user_id not in checked and user_id not in on_path:
+                path.append(user_id)
+                on_path.add(user_id)
+                user_id = managers[user_id]
+            if user_id in on_path:
+                for cycle_id in path[path.index(user_id):]:
+                    unlinked(cycle_id, 'Manager chain forms a cycle; imported without a manager')
+                    managers[cycle_id] = None
+            checked.update(path)
+        
+        updates = [{'id': user_id, 'manager_id': manager_id} for user_id, manager_id in managers.items() if manager_id]
+        for offset in range(0, len(updates), 5000):
+            db.session.execute(db.update(User), updates[offset:offset + 5000])
+        HierarchyService.add_users(managers)
+        db.session.commit()
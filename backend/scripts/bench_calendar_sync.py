@@ -0,0 +1,96 @@
+"""
+Throughput and coalescing of the calendar sync queue
+
+Creates handover schedules against a throwaway SQLite database, edits and
+deletes some of them, then drains the queue with the in-memory fake provider
+and reports how many changes were queued, how many provider calls were made
+and the changes applied per second.
+
+    python scripts/bench_calendar_sync.py --schedules 2000 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--schedules', type=int, default=2000, help='handover schedules created')
+    parser.add_argument('--updates', type=int, default=3, help='edits made to each schedule before syncing')
+    parser.add_argument('--delete-every', type=int, default=10, help='delete every Nth schedule (0 keeps all)')
+    parser.add_argument('--batch-size', type=int, default=50, help='changes per provider call')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per fake provider call')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='chance each change fails and is retried')
+    args = parser.parse_args()
+    
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['CALENDAR_PROVIDER'] = 'fake'
+    from app import create_app, db
+    from app.models import CalendarSyncOp, HandoverSchedule, SeparationCase, User
+    from app.services.calendar_service import FakeCalendarProvider
+    from app.services.calendar_sync_service import CalendarSyncService
+    
+    app = create_app()
+    app.config['CALENDAR_FAKE_LATENCY'] = args.latency
+    app.config['CALENDAR_FAKE_FAILURE_RATE'] = args.failure_rate
+    app.config['CALENDAR_SYNC_RETRY_DELAY'] = 0
+    try:
+        with app.app_context():
+            db.create_all()
+            user = User(email='bench@example.com', first_name='Bench', last_name='User')
+            db.session.add(user)
+            db.session.flush()
+            case = SeparationCase(case_number='SEP-BENCH-0001', employee_id=user.id,
+                                  resignation_date=date.today(), last_working_day=date.today())
+            db.session.add(case)
+            db.session.commit()
+            
+            changes = 0
+            for number in range(args.schedules):
+                schedule = HandoverSchedule(
+                    separation_case_id=case.id, title=f'Handover {number}', scheduled_date=date.today(),
+                    start_time=clock(10), end_time=clock(11), organizer_id=user.id
+                )
+                db.session.add(schedule)
+                db.session.flush()
+                CalendarSyncService.enqueue(schedule, 'create')
+                changes += 1
+                for edit in range(args.updates):
+                    schedule.title = f'Handover {number} v{edit + 2}'
+                    CalendarSyncService.enqueue(schedule, 'update')
+                    changes += 1
+                if args.delete_every and number % args.delete_every == 0:
+                    CalendarSyncService.enqueue(schedule, 'delete')
+                    db.session.delete(schedule)
+                    changes += 1
+                db.session.commit()
+            queued = CalendarSyncOp.query.count()
+            
+            FakeCalendarProvider.reset()
+            started = time.perf_counter()
+            while CalendarSyncService.process_pending(batch_size=args.batch_size):
+                db.session.remove()
+            elapsed = time.perf_counter() - started
+            
+            failed = CalendarSyncOp.query.filter_by(status='failed').count()
+            print(f'changes made            {changes:>8}')
+            print(f'queued after coalescing {queued:>8}')
+            print(f'provider calls          {FakeCalendarProvider.calls:>8}')
+            print(f'operations sent         {FakeCalendarProvider.operations:>8}')
+            print(f'events in calendar      {len(FakeCalendarProvider.events):>8}')
+            print(f'gave up                 {failed:>8}')
+            print(f'drained in {elapsed:.2f}s: {queued / elapsed:.0f} changes/sec, '
+                  f'{args.latency * queued:.1f}s if each change were its own call')
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Render throughput of the notification email templates
+
+Compares compiling the template source on every call, as
+render_template_string does, with rendering the precompiled templates held by
+EmailTemplateRegistry.
+
+    python scripts/bench_email_templates.py --seconds 1
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def sample_context():
+    """Objects with the attributes the templates read, without touching the database"""
+    employee = SimpleNamespace(first_name='John', full_name='John Doe')
+    manager = SimpleNamespace(first_name='Alex', full_name='Alex Lead')
+    department = SimpleNamespace(name='Information Technology')
+    case = SimpleNamespace(
+        id=42, case_number='SEP-2026-0042', employee=employee,
+        resignation_date=date(2026, 10, 1), last_working_day=date(2026, 10, 30),
+        checklist_submitted_at=datetime(2026, 10, 10, 9, 30), completed_at=datetime(2026, 10, 30, 17, 0)
+    )
+    signoff = SimpleNamespace(id=7, status='approved', comments='All equipment returned',
+                              department=department, assignee=manager)
+    return {'case': case, 'manager': manager, 'signoff': signoff, 'assignee': manager,
+            'url': 'http://localhost:3000/cases/42'}
+
+
+def rate(render, seconds):
+    """Renders per second of ``render()`` over roughly ``seconds``"""
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for _ in range(50):
+            render()
+        count += 50
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=1.0, help='time spent on each measurement')
+    args = parser.parse_args()
+    
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    from flask import render_template_string
+    from app import create_app
+    from app.services.email_templates import DEFAULT_TEMPLATES_DIR
+    
+    app = create_app()
+    context = sample_context()
+    with app.app_context():
+        registry = app.extensions['email_templates']
+        print(f"{'template':<22} {'compile per call':>18} {'precompiled':>14} {'speedup':>9}")
+        for name in registry.NAMES:
+            with open(os.path.join(DEFAULT_TEMPLATES_DIR, f'{name}.html'), encoding='utf-8') as source:
+                source = source.read()
+            inline = rate(lambda: render_template_string(source, **context), args.seconds)
+            compiled = rate(lambda: registry.render(name, **context), args.seconds)
+            print(f'{name:<22} {inline:>12.0f} /sec {compiled:>8.0f} /sec {compiled / inline:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
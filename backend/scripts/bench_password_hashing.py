@@ -0,0 +1,82 @@
+"""
+Login throughput benchmark for password hashing
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--logins', type=int, default=64, help='logins per run')
+    parser.add_argument('--threads', type=int, default=8, help='request threads in the simulated worker')
+    parser.add_argument('--pool-workers', type=int, default=os.cpu_count() or 2,
+                        help='PASSWORD_HASH_WORKERS for the pooled run')
+    parser.add_argument('--method', default='scrypt', help='PASSWORD_HASH_METHOD')
+    return parser.parse_args()
+
+
+def run_logins(app, email, logins, threads):
+    """POST /auth/login ``logins`` times from ``threads`` threads; returns logins per second"""
+    remaining = iter(range(logins))
+    lock = threading.Lock()
+    failures = []
+    
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            response = client.post('/auth/login', json={'email': email, 'password': 'bench-password'})
+            if response.status_code != 200:
+                failures.append(response.status_code)
+    
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if failures:
+        raise SystemExit(f'{len(failures)} logins failed: {failures[:5]}')
+    return logins / elapsed
+
+
+def main():
+    args = parse_args()
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['PASSWORD_HASH_METHOD'] = args.method
+    
+    from app import create_app, db
+    from app.models import User
+    
+    app = create_app()
+    email = 'bench@bench.local'
+    with app.app_context():
+        db.create_all()
+        user = User(email=email, first_name='Bench', last_name='User')
+        app.config['PASSWORD_HASH_WORKERS'] = 0
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.commit()
+    
+    print(f'{args.logins} logins, {args.threads} threads, method {args.method}')
+    for label, workers in (('inline hashing', 0), (f'{args.pool_workers}-process pool', args.pool_workers)):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        rate = run_logins(app, email, args.logins, args.threads)
+        print(f'  {label:<20} {rate:8.1f} logins/sec')
+    
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
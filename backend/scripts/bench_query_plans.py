@@ -0,0 +1,186 @@
+"""
+Query plan benchmark for the hot API queries
+
+Seeds a scratch database with N separation cases, then runs each hot query
+from app/routes/api.py with the model index pack dropped and again with it
+created, printing the query plan and mean latency for both runs.
+
+    python scripts/bench_query_plans.py --cases 100000
+
+Uses a temporary SQLite file unless --database-url points elsewhere.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cases', type=int, default=100000)
+    parser.add_argument('--items-per-case', type=int, default=5)
+    parser.add_argument('--signoffs-per-case', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url')
+    return parser.parse_args()
+
+
+def seed(db, models, args):
+    """Insert users, cases, checklist items and sign-offs with executemany batches"""
+    User, SeparationCase, ChecklistItem, SignOff = models
+    managers = max(args.cases // 200, 1)
+    statuses = ['checklist_pending', 'checklist_submitted', 'signoff_pending', 'completed', 'completed', 'cancelled']
+    start = datetime(2020, 1, 1)
+    
+    def insert(model, rows):
+        for offset in range(0, len(rows), 10000):
+            db.session.execute(db.insert(model), rows[offset:offset + 10000])
+    
+    insert(User, [{
+        'id': i, 'email': f'user{i}@bench.local', 'first_name': 'Bench', 'last_name': str(i),
+        'role': 'direct_manager' if i <= managers else 'employee',
+        'manager_id': None if i <= managers else (i % managers) + 1,
+        'is_active': i % 50 != 0
+    } for i in range(1, args.cases + managers + 1)])
+    
+    insert(SeparationCase, [{
+        'id': i, 'case_number': f'BENCH-{i:07d}', 'employee_id': managers + i,
+        'direct_manager_id': (i % managers) + 1, 'status': statuses[i % len(statuses)],
+        'resignation_date': date(2020, 1, 1), 'last_working_day': date(2020, 2, 1),
+        'created_at': start + timedelta(minutes=i)
+    } for i in range(1, args.cases + 1)])
+    
+    insert(ChecklistItem, [{
+        'separation_case_id': case_id, 'name': f'Item {n}', 'order': n,
+        'is_mandatory': n % 2 == 0, 'is_completed': (case_id + n) % 3 == 0
+    } for case_id in range(1, args.cases + 1) for n in range(args.items_per_case)])
+    
+    insert(SignOff, [{
+        'separation_case_id': case_id, 'department_id': n + 1,
+        'assigned_to': ((case_id + n) % managers) + 1,
+        'status': 'pending' if case_id % 4 else 'approved',
+        'assigned_at': start + timedelta(minutes=case_id)
+    } for case_id in range(1, args.cases + 1) for n in range(args.signoffs_per_case)])
+    
+    db.session.commit()
+    return managers
+
+
+def hot_queries(db, models, managers, cases):
+    """The query shapes issued by the list, checklist, sign-off and org endpoints"""
+    User, SeparationCase, ChecklistItem, SignOff = models
+    case_id = cases // 2
+    manager_id = managers // 2 or 1
+    return {
+        'active case for employee': SeparationCase.query.filter(
+            SeparationCase.employee_id == managers + case_id,
+            SeparationCase.status.notin_(['completed', 'cancelled'])
+        ),
+        'cases by employee and status': SeparationCase.query.filter_by(
+            employee_id=managers + case_id, status='completed'
+        ),
+        'cases for direct manager': SeparationCase.query.filter_by(
+            direct_manager_id=manager_id
+        ).order_by(SeparationCase.created_at.desc()).limit(10),
+        'cases by status': SeparationCase.query.filter_by(
+            status='signoff_pending'
+        ).order_by(SeparationCase.created_at.desc()).limit(10),
+        'sign-offs for assignee': SignOff.query.filter_by(
+            assigned_to=manager_id, status='pending'
+        ),
+        'sign-offs for case by status': SignOff.query.filter_by(
+            separation_case_id=case_id, status='pending'
+        ),
+        'pending sign-off queue page': SignOff.query.filter_by(
+            assigned_to=manager_id, status='pending'
+        ).order_by(SignOff.assigned_at, SignOff.id).limit(10),
+        'checklist for case': ChecklistItem.query.filter_by(
+            separation_case_id=case_id
+        ).order_by(ChecklistItem.order),
+        'mandatory incomplete items': ChecklistItem.query.filter_by(
+            separation_case_id=case_id, is_mandatory=True, is_completed=False
+        ),
+        'active reports of manager': User.query.filter_by(
+            manager_id=manager_id, is_active=True
+        ),
+    }
+
+
+def explain(db, sql):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+        return '; '.join(row[-1] for row in rows)
+    rows = db.session.execute(db.text(f'EXPLAIN {sql}')).fetchall()
+    return '; '.join(row[0].strip() for row in rows)
+
+
+def measure(db, queries, repeat):
+    results = {}
+    for name, query in queries.items():
+        sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        plan = explain(db, sql)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(db.text(sql)).fetchall()
+        results[name] = (plan, (time.perf_counter() - started) / repeat * 1000)
+    return results
+
+
+def index_pack(db):
+    """Every secondary index declared on the models, except unique column indexes"""
+    return [index for table in db.metadata.sorted_tables for index in table.indexes if not index.unique]
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    
+    from app import create_app, db
+    from app.models import User, SeparationCase, ChecklistItem, SignOff
+    models = (User, SeparationCase, ChecklistItem, SignOff)
+    
+    app = create_app()
+    with app.app_context():
+        for index in index_pack(db):
+            index.drop(bind=db.engine, checkfirst=True)
+        
+        print(f'Seeding {args.cases} cases...')
+        started = time.perf_counter()
+        managers = seed(db, models, args)
+        print(f'Seeded in {time.perf_counter() - started:.1f}s\n')
+        
+        queries = hot_queries(db, models, managers, args.cases)
+        db.session.execute(db.text('ANALYZE'))
+        before = measure(db, queries, args.repeat)
+        
+        for index in index_pack(db):
+            index.create(bind=db.engine, checkfirst=True)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        after = measure(db, queries, args.repeat)
+        
+        for name in queries:
+            plan_before, ms_before = before[name]
+            plan_after, ms_after = after[name]
+            print(f'{name}')
+            print(f'  without index pack: {ms_before:8.2f} ms  {plan_before}')
+            print(f'  with index pack:    {ms_after:8.2f} ms  {plan_after}')
+        
+        if not args.database_url:
+            db.session.remove()
+            db.engine.dispose()
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
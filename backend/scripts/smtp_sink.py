@@ -0,0 +1,109 @@
+"""
+Stand-in SMTP server for exercising the mail worker locally
+
+Accepts every message and prints its envelope and subject; nothing is relayed.
+Point the app at it with TLS off:
+
+    python scripts/smtp_sink.py --port 1025
+    MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false flask run-mail-worker
+
+--fail-every N answers every Nth message with a temporary failure so the
+worker's retry and backoff path can be watched.
+"""
+import argparse
+import email
+import socketserver
+import threading
+from email.header import decode_header, make_header
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """One SMTP session: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP and QUIT"""
+    
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+    
+    def handle(self):
+        self.reply('220 smtp-sink ready')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                self.reply(self.server.accept(sender, recipients, b''.join(data)))
+                sender, recipients = None, []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self, address, fail_every=0, quiet=False):
+        super().__init__(address, SMTPHandler)
+        self.fail_every = fail_every
+        self.quiet = quiet
+        self.received = 0
+        self.messages = []
+        self._lock = threading.Lock()
+    
+    def accept(self, sender, recipients, data):
+        """Record a message and return the reply to its DATA command"""
+        with self._lock:
+            self.received += 1
+            if self.fail_every and self.received % self.fail_every == 0:
+                return '451 Temporary failure (smtp-sink --fail-every)'
+            message = email.message_from_bytes(data)
+            subject = str(make_header(decode_header(message.get('Subject', ''))))
+            self.messages.append({'from': sender, 'to': recipients, 'subject': subject})
+        if not self.quiet:
+            print(f"{sender} -> {', '.join(recipients)}: {subject}", flush=True)
+        return '250 OK: queued'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--fail-every', type=int, default=0, help='temporarily reject every Nth message')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+    
+    with SMTPSink((args.host, args.port), fail_every=args.fail_every, quiet=args.quiet) as server:
+        print(f'smtp-sink listening on {args.host}:{args.port}', flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
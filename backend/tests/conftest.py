@@ -0,0 +1,56 @@
+"""
+Shared fixtures: an app on a scratch SQLite database seeded with the sample users
+"""
+import pytest
+from app import create_app, db
+from app.pagination import _total_cache
+from app.routes.auth import _principal_cache
+from app.services.calendar_feed_service import CalendarFeedService
+from app.services.catalog_service import CatalogService
+from app.services.dashboard_service import DashboardService
+from app.services.token_service import TokenService
+
+
+def reset_caches():
+    """Drop per-process caches, which would otherwise carry rows over from another test's database"""
+    for cache in (_total_cache, _principal_cache, CalendarFeedService._feeds, CalendarFeedService._events,
+                  DashboardService._cache):
+        cache.clear()
+    for catalog in (TokenService.revocations, CatalogService.templates, CatalogService.departments):
+        catalog.reset()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    reset_caches()
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    app = create_app()
+    app.config.update(TESTING=True, MAIL_SUPPRESS_SEND=True)
+    app.extensions['mail'].suppress = True
+    with app.app_context():
+        db.create_all()
+    result = app.test_cli_runner().invoke(args=['create-sample-users'])
+    assert result.exit_code == 0, result.output
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    def login(email, password='password123'):
+        response = client.post('/auth/login', json={'email': email, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()['token']
+    return login
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
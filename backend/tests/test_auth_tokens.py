@@ -0,0 +1,38 @@
+"""
+Token revocation after password changes
+"""
+import pytest
+from app import db
+from app.models import User, UserRole
+from app.services.token_service import TokenService
+from tests.conftest import bearer
+
+
+@pytest.mark.parametrize('stateless', [False, True])
+def test_old_token_rejected_after_password_change(app, client, login, stateless):
+    app.config['AUTH_STATELESS'] = stateless
+    old_token = login('employee1@company.com')
+    assert client.get('/auth/me', headers=bearer(old_token)).status_code == 200
+    
+    response = client.post('/auth/change-password', headers=bearer(old_token),
+                           json={'current_password': 'password123', 'new_password': 'new-password-456'})
+    assert response.status_code == 200
+    new_token = response.get_json()['token']
+    
+    assert client.get('/auth/me', headers=bearer(old_token)).status_code == 401
+    assert client.get('/auth/me', headers=bearer(new_token)).status_code == 200
+
+
+def test_role_change_in_another_worker_reloads_principal(app, client, login):
+    token = login('employee2@company.com')
+    assert client.post('/api/users/bulk', headers=bearer(token), json={'users': []}).status_code == 403
+    
+    # As another worker would: bump the generation without invalidate_principal()
+    with app.app_context():
+        user = User.query.filter_by(email='employee2@company.com').first()
+        user.role = UserRole.SEPARATION_MANAGER
+        TokenService.revoke(user.id)
+        db.session.commit()
+    
+    token = login('employee2@company.com')
+    assert client.post('/api/users/bulk', headers=bearer(token), json={'users': []}).status_code == 200
@@ -0,0 +1,79 @@
+"""
+ICS calendar feed validators and event times
+"""
+from datetime import date, timedelta, time as clock
+from app import db
+from app.models import HandoverSchedule, SeparationCase, User
+from app.services.handover_service import HandoverService
+from tests.conftest import bearer
+
+
+def _feed(app, client, login, email, timezone='UTC'):
+    app.config['HANDOVER_TIMEZONE'] = timezone
+    url = client.get('/api/calendar/feed', headers=bearer(login(email))).get_json()['url']
+    return url[url.index('/api/'):]
+
+
+def _add_case(app, day):
+    with app.app_context():
+        employee = User.query.filter_by(email='employee1@company.com').first()
+        manager = User.query.filter_by(email='eng.lead@company.com').first()
+        case = SeparationCase(case_number='SEP-TEST-0001', employee_id=employee.id, direct_manager_id=manager.id,
+                              resignation_date=day - timedelta(days=30), last_working_day=day)
+        db.session.add(case)
+        db.session.flush()
+        schedule = HandoverSchedule(separation_case_id=case.id, title='Handover', scheduled_date=day,
+                                    start_time=clock(10), end_time=clock(11), organizer_id=manager.id,
+                                    attendees=[employee.id])
+        db.session.add(schedule)
+        db.session.flush()
+        HandoverService.sync_attendees(schedule)
+        db.session.commit()
+
+
+def test_handover_times_sent_in_utc(app, client, login):
+    day = date.today() + timedelta(days=7)
+    _add_case(app, day)
+    url = _feed(app, client, login, 'eng.lead@company.com', timezone='Asia/Kolkata')
+    
+    body = client.get(url).get_data(as_text=True)
+    assert f"DTSTART:{day.strftime('%Y%m%d')}T043000Z" in body
+    assert f"DTEND:{day.strftime('%Y%m%d')}T053000Z" in body
+
+
+def test_etag_changes_when_employee_renamed(app, client, login):
+    _add_case(app, date.today() + timedelta(days=7))
+    url = _feed(app, client, login, 'eng.lead@company.com')
+    first = client.get(url)
+    assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    
+    response = client.put('/auth/profile', headers=bearer(login('employee1@company.com')),
+                          json={'last_name': 'Renamed'})
+    assert response.status_code == 200
+    
+    second = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert 'Renamed' in second.get_data(as_text=True)
+
+
+def test_line_breaks_cannot_add_content_lines(app, client, login):
+    day = date.today() + timedelta(days=7)
+    _add_case(app, day)
+    with app.app_context():
+        # Rows written before links were cleaned on save are cleaned again when rendered
+        schedule = HandoverSchedule.query.first()
+        schedule.meeting_link = 'http://x\r\nBEGIN:VEVENT\r\nSUMMARY:Injected'
+        schedule.location = 'Room\r1'
+        db.session.commit()
+        case_id, schedule_id = schedule.separation_case_id, schedule.id
+    url = _feed(app, client, login, 'eng.lead@company.com')
+    
+    body = client.get(url).get_data(as_text=True)
+    assert body.split('\r\n').count('BEGIN:VEVENT') == 2
+    assert 'URL:http://xBEGIN:VEVENTSUMMARY:Injected\r\n' in body
+    assert 'LOCATION:Room\\n1\r\n' in body
+    
+    response = client.put(f'/api/separations/{case_id}/handover/{schedule_id}',
+                          headers=bearer(login('eng.lead@company.com')),
+                          json={'meeting_link': 'https://meet.example.com/abc\r\nX-INJECTED:1'})
+    assert response.get_json()['schedule']['meeting_link'] == 'https://meet.example.com/abcX-INJECTED:1'
@@ -0,0 +1,55 @@
+"""
+Handover booking conflict checks
+"""
+from datetime import date, timedelta, time as clock
+from app import db
+from app.models import HandoverSchedule, SeparationCase, User
+from app.services.handover_service import HandoverService
+from tests.conftest import bearer
+
+DAY = date.today() + timedelta(days=7)
+
+
+def _book(app):
+    """Handover on employee1's case, organized by their manager; returns employee1's id"""
+    with app.app_context():
+        employee = User.query.filter_by(email='employee1@company.com').first()
+        manager = User.query.filter_by(email='eng.lead@company.com').first()
+        case = SeparationCase(case_number='SEP-TEST-0001', employee_id=employee.id, direct_manager_id=manager.id,
+                              resignation_date=DAY - timedelta(days=30), last_working_day=DAY)
+        db.session.add(case)
+        db.session.flush()
+        schedule = HandoverSchedule(separation_case_id=case.id, title='Payroll handover', scheduled_date=DAY,
+                                    start_time=clock(10), end_time=clock(11), organizer_id=manager.id,
+                                    attendees=[employee.id])
+        db.session.add(schedule)
+        db.session.flush()
+        HandoverService.sync_attendees(schedule)
+        db.session.commit()
+        return employee.id
+
+
+def _conflicts(client, login, email, employee_id):
+    response = client.post('/api/handover/conflicts', headers=bearer(login(email)), json={
+        'scheduled_date': DAY.isoformat(), 'start_time': '10:30', 'end_time': '11:30', 'attendees': [employee_id]
+    })
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_other_cases_reported_as_busy_time_only(app, client, login):
+    employee_id = _book(app)
+    result = _conflicts(client, login, 'employee2@company.com', employee_id)
+    
+    assert result['conflicting_user_ids'] == [employee_id]
+    assert result['conflicts'] == [{
+        'user_id': employee_id, 'scheduled_date': DAY.isoformat(), 'start_time': '10:00', 'end_time': '11:00'
+    }]
+
+
+def test_accessible_cases_reported_in_full(app, client, login):
+    employee_id = _book(app)
+    conflicts = _conflicts(client, login, 'eng.lead@company.com', employee_id)['conflicts']
+    
+    assert {conflict['title'] for conflict in conflicts} == {'Payroll handover'}
+    assert all(conflict['separation_case_id'] for conflict in conflicts)
@@ -0,0 +1,60 @@
+"""
+Free-slot finder for handover attendees
+"""
+from datetime import date, datetime, time as clock
+import pytest
+from app import db
+from app.models import HandoverSchedule, SeparationCase, User
+from app.services import handover_service
+from app.services.handover_service import HandoverService
+
+MONDAY = date(2030, 1, 7)
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Pin the finder's clock to ``MONDAY`` at the given time"""
+    def freeze(hour, minute):
+        class FrozenDateTime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls.combine(MONDAY, clock(hour, minute, 30), tzinfo=tz)
+        monkeypatch.setattr(handover_service, 'datetime', FrozenDateTime)
+    return freeze
+
+
+def _book(user_id, start, end):
+    case = SeparationCase(case_number=f'SEP-TEST-{start:04d}', employee_id=user_id,
+                          resignation_date=MONDAY, last_working_day=MONDAY)
+    db.session.add(case)
+    db.session.flush()
+    schedule = HandoverSchedule(separation_case_id=case.id, title='Booked', scheduled_date=MONDAY,
+                                start_time=clock(start), end_time=clock(end), organizer_id=user_id)
+    db.session.add(schedule)
+    db.session.flush()
+    HandoverService.sync_attendees(schedule)
+    db.session.commit()
+
+
+def _times(slots):
+    return [(slot['start_time'], slot['end_time']) for slot in slots]
+
+
+def test_gaps_split_into_slots_of_the_duration(app, frozen_now):
+    frozen_now(7, 0)
+    with app.app_context():
+        user_id = User.query.filter_by(email='employee1@company.com').first().id
+        _book(user_id, 11, 15)
+        slots = HandoverService.free_slots({user_id}, MONDAY, MONDAY, 60)
+    
+    assert _times(slots) == [('09:00', '10:00'), ('10:00', '11:00'), ('15:00', '16:00'), ('16:00', '17:00')]
+
+
+def test_past_times_today_are_skipped(app, frozen_now):
+    frozen_now(13, 20)
+    with app.app_context():
+        user_id = User.query.filter_by(email='employee1@company.com').first().id
+        slots = HandoverService.free_slots({user_id}, date(2030, 1, 1), MONDAY, 45)
+    
+    assert {slot['scheduled_date'] for slot in slots} == {MONDAY.isoformat()}
+    assert _times(slots) == [('13:30', '14:15'), ('14:15', '15:00'), ('15:00', '15:45'), ('15:45', '16:30')]
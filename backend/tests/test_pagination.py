@@ -0,0 +1,25 @@
+"""
+Cursor pagination of list endpoints
+"""
+from datetime import date
+import pytest
+from app import db
+from app.models import SeparationCase, User
+from tests.conftest import bearer
+
+
+@pytest.mark.parametrize('per_page', [0, -5])
+def test_per_page_below_one_returns_one_case(app, client, login, per_page):
+    with app.app_context():
+        employee = User.query.filter_by(email='employee1@company.com').first()
+        for number in range(3):
+            db.session.add(SeparationCase(case_number=f'SEP-TEST-{number:04d}', employee_id=employee.id,
+                                          resignation_date=date(2030, 1, 1), last_working_day=date(2030, 2, 1)))
+        db.session.commit()
+    
+    token = login('hr.admin@company.com')
+    response = client.get(f'/api/separations?cursor=&per_page={per_page}', headers=bearer(token))
+    assert response.status_code == 200
+    result = response.get_json()
+    assert len(result['cases']) == 1
+    assert result['has_more']
@@ -0,0 +1,30 @@
+"""
+Bulk user import validation
+"""
+from tests.conftest import bearer
+
+
+def test_non_string_fields_reported_per_row(client, login):
+    token = login('hr.admin@company.com')
+    response = client.post('/api/users/bulk', headers=bearer(token), json={'users': [
+        {'email': 123, 'first_name': 'Number', 'last_name': 'Email'},
+        {'email': None, 'first_name': 'Null', 'last_name': 'Email'},
+        {'email': 'list.name@company.com', 'first_name': ['A'], 'last_name': 'Name'},
+        {'email': 'new.user@company.com', 'first_name': 'New', 'last_name': 'User', 'department_id': 1},
+    ]})
+    
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['created'] == 1
+    assert [(error['row'], error['error']) for error in result['errors']] == [
+        (1, 'email must be a string'),
+        (2, 'email is required'),
+        (3, 'first_name must be a string'),
+    ]
+
+
+def test_json_body_must_be_an_object(client, login):
+    token = login('hr.admin@company.com')
+    for body in ([{'email': 'a@company.com'}], 'users', 5):
+        response = client.post('/api/users/bulk', headers=bearer(token), json=body)
+        assert response.status_code == 400